@@ -0,0 +1,57 @@
+import threading
+
+
+class PeriodicJob:
+    """Run a unit of work on a daemon thread at a fixed interval."""
+
+    name = "periodic-job"
+
+    def __init__(
+        self, interval_seconds: float = 60.0, pause_seconds: float = 0.05
+    ):
+        self.interval = float(interval_seconds)
+        self.pause = float(pause_seconds)  # breather between batches
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._thread = None
+
+    def step(self) -> bool:
+        """Do one unit of work. Return True if more work is pending."""
+        raise NotImplementedError
+
+    def start(self):
+        """Start the worker thread (no-op if already running)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=self.name, daemon=True
+        )
+        self._thread.start()
+
+    def wake(self):
+        """Run the next step now instead of waiting out the interval."""
+        self._wake_event.set()
+
+    def stop(self, timeout: float = 2.0):
+        """Ask the worker to stop and wait briefly for it."""
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop_event.is_set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            more = False
+            try:
+                more = bool(self.step())
+            except Exception as e:
+                # A failing job must not take the app down; try again later
+                print(f"{self.name} error: {e}")
+            self._wake_event.wait(self.pause if more else self.interval)
+            self._wake_event.clear()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Append-only backup journal for clipboard history.
+
+Items are appended as NDJSON lines to numbered segment files (gzip by
+default). When a segment grows past a size limit or gets too old it is
+sealed: its SHA-256 goes into manifest.json and a new segment is started.
+Appends are fsynced in batches, so a backup costs O(new items) no matter
+how big the history is.
+
+Compact the journal into a full JSON snapshot (the export format) with:
+
+    python backup_journal.py compact clipboard_history.journal snapshot.json
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+MANIFEST_NAME = "manifest.json"
+
+
+class JournalCorruptError(Exception):
+    """A sealed segment no longer matches its recorded checksum."""
+
+
+class BackupJournal:
+    """Append-only, segmented NDJSON journal with per-segment checksums."""
+
+    def __init__(
+        self,
+        directory,
+        compress: bool = True,
+        segment_max_bytes: int = 16 * 1024 * 1024,
+        segment_max_age_seconds: float = 7 * 24 * 3600,
+        fsync_every: int = 256,
+    ):
+        self.directory = Path(directory)
+        self.compress = compress
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_age = segment_max_age_seconds
+        self.fsync_every = max(1, int(fsync_every))
+        self._manifest = None
+
+    # ---------- Manifest ----------
+
+    @property
+    def manifest_path(self):
+        return self.directory / MANIFEST_NAME
+
+    def _load_manifest(self):
+        if self._manifest is None:
+            try:
+                with open(self.manifest_path, "r", encoding="utf-8") as f:
+                    self._manifest = json.load(f)
+            except FileNotFoundError:
+                self._manifest = {"version": 1, "segments": [], "active": None}
+        return self._manifest
+
+    def _save_manifest(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    # ---------- Segments ----------
+
+    def _segment_name(self, number):
+        suffix = ".jsonl.gz" if self.compress else ".jsonl"
+        return f"segment-{number:06d}{suffix}"
+
+    def _active_segment(self):
+        """Return the active segment entry, rotating or creating as needed."""
+        manifest = self._load_manifest()
+        active = manifest.get("active")
+        if active is not None:
+            path = self.directory / active["name"]
+            too_big = path.exists() and (
+                path.stat().st_size >= self.segment_max_bytes
+            )
+            too_old = time.time() - active["created"] >= self.segment_max_age
+            if too_big or too_old:
+                self.rotate()
+                active = None
+
+        if active is None:
+            number = len(manifest["segments"]) + 1
+            active = {
+                "name": self._segment_name(number),
+                "created": time.time(),
+                "records": 0,
+            }
+            manifest["active"] = active
+            self._save_manifest()
+        return active
+
+    def _open_for_append(self, name):
+        path = self.directory / name
+        if name.endswith(".gz"):
+            # Each append session adds a gzip member; readers see one stream
+            return gzip.open(path, "ab")
+        return open(path, "ab")
+
+    def rotate(self):
+        """Seal the active segment (record its checksum) if there is one."""
+        manifest = self._load_manifest()
+        active = manifest.get("active")
+        if active is None:
+            return
+        path = self.directory / active["name"]
+        if path.exists() and active["records"]:
+            active["bytes"] = path.stat().st_size
+            active["sha256"] = _file_sha256(path)
+            active["sealed"] = time.time()
+            manifest["segments"].append(active)
+        elif path.exists():
+            path.unlink()
+        manifest["active"] = None
+        self._save_manifest()
+
+    # ---------- Writing ----------
+
+    def append(self, records):
+        """
+        Append records (JSON-serializable dicts) to the active segment.
+
+        Data is fsynced every `fsync_every` records and once at the end, so
+        when this returns everything passed in is durable.
+        """
+        records = list(records)
+        if not records:
+            return 0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        active = self._active_segment()
+        pending = 0
+        with self._open_for_append(active["name"]) as f:
+            raw = getattr(f, "fileobj", None) or f
+            for record in records:
+                line = json.dumps(record, ensure_ascii=False) + "\n"
+                f.write(line.encode("utf-8"))
+                pending += 1
+                if pending >= self.fsync_every:
+                    _sync(f, raw)
+                    pending = 0
+            _sync(f, raw)
+
+        active["records"] += len(records)
+        self._save_manifest()
+        return len(records)
+
+    # ---------- Reading ----------
+
+    def segments(self):
+        """Yield (entry, sealed) for every segment, oldest first."""
+        manifest = self._load_manifest()
+        for entry in manifest["segments"]:
+            yield entry, True
+        if manifest.get("active"):
+            yield manifest["active"], False
+
+    def verify(self):
+        """Check every sealed segment; raise JournalCorruptError on mismatch."""
+        for entry, sealed in self.segments():
+            if sealed:
+                path = self.directory / entry["name"]
+                if _file_sha256(path) != entry["sha256"]:
+                    raise JournalCorruptError(f"Checksum mismatch: {path}")
+
+    def iter_records(self, verify: bool = True):
+        """Stream every journaled record, oldest first."""
+        for entry, sealed in self.segments():
+            path = self.directory / entry["name"]
+            if not path.exists():
+                continue
+            if sealed and verify and _file_sha256(path) != entry["sha256"]:
+                raise JournalCorruptError(f"Checksum mismatch: {path}")
+            opener = gzip.open if entry["name"].endswith(".gz") else open
+            try:
+                with opener(path, "rb") as f:
+                    for line in f:
+                        try:
+                            yield json.loads(line)
+                        except json.JSONDecodeError:
+                            # Torn final write in the active segment
+                            if sealed:
+                                raise
+            except EOFError:
+                # Truncated gzip member from an interrupted append
+                if sealed:
+                    raise
+
+    def compact(self, output_path, verify: bool = True):
+        """
+        Write a full JSON snapshot (export format) from the journal.
+
+        Later records for the same id replace earlier ones. Returns the
+        number of items written.
+        """
+        # Pass 1 remembers where each id was last seen, so memory is
+        # proportional to the number of ids rather than the data size
+        last_seen = {}
+        for position, record in enumerate(self.iter_records(verify=verify)):
+            last_seen[record.get("id")] = position
+        total = len(last_seen)
+
+        output_path = Path(output_path)
+        tmp_path = output_path.with_name(output_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write('{"export_info": ')
+            json.dump(
+                {
+                    "timestamp": datetime.now().isoformat(),
+                    "total_items": total,
+                    "version": "1.0",
+                    "compacted_from": str(self.directory),
+                },
+                f,
+            )
+            f.write(', "items": [')
+            written = 0
+            records = self.iter_records(verify=False)
+            for position, record in enumerate(records):
+                if last_seen.get(record.get("id")) != position:
+                    continue
+                if written:
+                    f.write(", ")
+                json.dump(record, f, ensure_ascii=False)
+                written += 1
+            f.write("]}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, output_path)
+        return written
+
+
+def _sync(f, raw):
+    f.flush()
+    if raw is not f:
+        raw.flush()
+    os.fsync(raw.fileno())
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Clipboard history backup journal tools"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    compact = sub.add_parser("compact", help="write a full JSON snapshot")
+    compact.add_argument("journal", help="journal directory")
+    compact.add_argument("output", help="snapshot JSON file to write")
+    compact.add_argument(
+        "--no-verify", action="store_true", help="skip checksum verification"
+    )
+
+    verify = sub.add_parser("verify", help="check sealed segment checksums")
+    verify.add_argument("journal", help="journal directory")
+
+    args = parser.parse_args(argv)
+    journal = BackupJournal(args.journal)
+    try:
+        if args.command == "compact":
+            count = journal.compact(args.output, verify=not args.no_verify)
+            print(f"Wrote {count} items to {args.output}")
+        else:
+            journal.verify()
+            print("All sealed segments OK")
+    except JournalCorruptError as e:
+        print(f"❌ {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from background_jobs import PeriodicJob
+from fingerprints import fingerprint
+
+
+class BlobStore:
+    """
+    Content-addressed files for payloads too big to keep in SQLite.
+
+    A blob's key is the hex fingerprint of its bytes, stored under two
+    levels of shard directories (ab/cd/abcd...). Writes go to a temp file
+    that is fsynced and renamed into place, so a blob is either complete or
+    absent. Reads are memory-mapped. Which blobs are still in use is
+    tracked by the database (blob_refs), not here.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def path(self, key):
+        return self.directory / key[:2] / key[2:4] / key
+
+    def put(self, data) -> str:
+        """Store bytes (or str as UTF-8) and return their key."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        key = fingerprint(data).hex()
+        path = self.path(key)
+        if path.exists():
+            # Same content, same key: nothing to write
+            return key
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        return key
+
+    @contextmanager
+    def view(self, key):
+        """Yield a read-only memoryview over a blob (None if missing)."""
+        try:
+            f = open(self.path(key), "rb")
+        except FileNotFoundError:
+            yield None
+            return
+        with f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield memoryview(b"")
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    yield view
+                finally:
+                    view.release()
+
+    def get(self, key):
+        """Return a blob's bytes, or None if it's missing."""
+        with self.view(key) as view:
+            return None if view is None else bytes(view)
+
+    def get_text(self, key):
+        data = self.get(key)
+        return None if data is None else data.decode("utf-8", errors="replace")
+
+    def size(self, key) -> int:
+        """Size of a blob in bytes (0 if it's missing)."""
+        try:
+            return self.path(key).stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def delete(self, key):
+        try:
+            self.path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def keys(self):
+        """Yield the key of every stored blob."""
+        if not self.directory.exists():
+            return
+        for shard in self.directory.iterdir():
+            if not shard.is_dir():
+                continue
+            for subshard in shard.iterdir():
+                if not subshard.is_dir():
+                    continue
+                for entry in os.scandir(subshard):
+                    if entry.is_file() and not entry.name.endswith(".tmp"):
+                        yield entry.name
+
+
+class BlobGarbageCollectionJob(PeriodicJob):
+    """
+    Delete blobs no item refers to any more.
+
+    Zero-count entries in blob_refs are removed first; then the store is
+    swept for files the database has never heard of (left behind by a
+    transaction that rolled back). Deletions happen under the writer lock,
+    so they can't race an insert that is about to reference the blob.
+    """
+
+    name = "blob-gc"
+
+    def __init__(
+        self,
+        db_manager,
+        interval_seconds: float = 3600.0,
+        sweep_batch: int = 500,
+    ):
+        super().__init__(interval_seconds=interval_seconds)
+        self.db_manager = db_manager
+        self.sweep_batch = sweep_batch
+
+    def step(self):
+        connections = self.db_manager.connections
+        blobs = self.db_manager.blobs
+        with connections.writer() as conn:
+            dead = conn.execute(
+                "SELECT blob_key FROM blob_refs WHERE refs <= 0"
+            ).fetchall()
+            for (key,) in dead:
+                blobs.delete(key)
+            conn.execute("DELETE FROM blob_refs WHERE refs <= 0")
+
+        keys = list(blobs.keys())
+        for start in range(0, len(keys), self.sweep_batch):
+            batch = keys[start : start + self.sweep_batch]
+            placeholders = ", ".join("?" for _ in batch)
+            with connections.writer() as conn:
+                known = {
+                    key
+                    for (key,) in conn.execute(
+                        f"SELECT blob_key FROM blob_refs WHERE blob_key IN ({placeholders})",
+                        batch,
+                    )
+                }
+                for key in batch:
+                    if key not in known:
+                        blobs.delete(key)
+        return False
@@ -7,7 +7,7 @@ automatic backup, and improved UI features.
 
 import sys
 import os
-import base64
+import sqlite3
 from urllib.parse import urlparse
 
 
@@ -32,8 +32,38 @@ from PyQt6.QtGui import (
 )
 
 from clipboard_history_widget import ClipboardHistoryWidget
-from clipboard_monitor import ClipboardMonitor
-from database_manager import DatabaseManager
+from clipboard_monitor import ClipboardMonitor, image_mime_data
+from database_manager import DatabaseManager, image_payload
+from database_writer import DatabaseWriter
+from export_worker import ExportWorker
+from maintenance import compact_database, needs_compaction
+from retention import RetentionPolicy
+from thumbnailer import ThumbnailJob
+
+# Retention limits kept in QSettings; 0 (the default) means no limit
+RETENTION_SETTINGS = (
+    "retention/max_items",
+    "retention/max_bytes",
+    "retention/max_age_days",
+)
+
+
+def retention_policy(settings):
+    """
+    RetentionPolicy from the settings; nothing is pruned unless a limit is
+    set. The least used items go first and favorites never do.
+    """
+    for key in RETENTION_SETTINGS:
+        if not settings.contains(key):
+            settings.setValue(key, 0)  # listed in the settings file to edit
+    max_items, max_bytes, max_age_days = (
+        settings.value(key, 0, type=int) for key in RETENTION_SETTINGS
+    )
+    return RetentionPolicy(
+        max_items=max_items or None,
+        max_bytes=max_bytes or None,
+        max_age_days={"all": max_age_days} if max_age_days else None,
+    )
 
 
 class ClipboardHistoryApp:
@@ -42,15 +72,33 @@ class ClipboardHistoryApp:
     def __init__(self):
         self.show_hotkey = None
         self.recent_items_actions = None
+        self.export_worker = None
         self.app = QApplication(sys.argv)
         self.app.setQuitOnLastWindowClosed(False)
 
+        # Settings
+        self.settings = QSettings("ClipboardHistory", "ClipboardHistoryApp")
+
         # Initialize database
-        self.db_manager = DatabaseManager()
+        db_path = "clipboard_history.db"
+        self.compact_legacy_database(db_path)
+        self.db_manager = DatabaseManager(
+            db_path, retention=retention_policy(self.settings)
+        )
 
         # Perform startup backup
         self.perform_startup_backup()
 
+        # Resumable maintenance (legacy image conversion, thumbnail backfill)
+        self.thumbnail_job = ThumbnailJob(self.db_manager)
+        self._thumbnails_pending = False
+        self.db_manager.start_background_jobs(self.thumbnail_job)
+
+        # Group-commit writer so clipboard bursts never block the GUI
+        self.db_writer = DatabaseWriter(self.db_manager)
+        self.db_writer.batch_committed.connect(self.on_batch_committed)
+        self.db_writer.start()
+
         # Initialize clipboard monitor
         self.clipboard_monitor = ClipboardMonitor()
         self.clipboard_monitor.clipboard_changed.connect(
@@ -58,7 +106,9 @@ class ClipboardHistoryApp:
         )
 
         # Initialize main widget
-        self.main_widget = ClipboardHistoryWidget(self.db_manager)
+        self.main_widget = ClipboardHistoryWidget(
+            self.db_manager, self.db_writer
+        )
 
         # Setup system tray
         self.setup_system_tray()
@@ -66,13 +116,24 @@ class ClipboardHistoryApp:
         # Setup global hotkeys
         self.setup_hotkeys()
 
-        # Settings
-        self.settings = QSettings("ClipboardHistory", "ClipboardHistoryApp")
         self.load_settings()
 
         # Start clipboard monitoring
         self.clipboard_monitor.start()
 
+    def compact_legacy_database(self, db_path):
+        """
+        One-off conversion of a database created before incremental
+        auto-vacuum; done before anything here opens the database.
+        """
+        try:
+            if needs_compaction(db_path):
+                old_size, new_size = compact_database(db_path)
+                print(f"Compacted database: {old_size:,} -> {new_size:,} bytes")
+        except (sqlite3.Error, OSError) as e:
+            # e.g. another instance has it open; try again next start
+            print(f"Database compaction skipped: {e}")
+
     def perform_startup_backup(self):
         """Perform automatic backup on startup."""
         try:
@@ -136,25 +197,31 @@ class ClipboardHistoryApp:
 
 
     def quick_export(self):
-        """Quick export from tray menu."""
-        try:
-            export_path = self.db_manager.backup_path
-            item_count = self.db_manager.export_to_json(
-                export_path, favorites_only=False
-            )
-            self.tray_icon.showMessage(
+        """Quick export from tray menu, written on a background thread."""
+        if self.export_worker is not None and self.export_worker.isRunning():
+            return
+
+        export_path = self.db_manager.backup_path
+        self.export_worker = ExportWorker(
+            self.db_manager, export_path, favorites_only=False
+        )
+        self.export_worker.completed.connect(
+            lambda item_count: self.tray_icon.showMessage(
                 "Export Complete",
                 f"Exported {item_count} items to {export_path.name}",
                 QSystemTrayIcon.MessageIcon.Information,
                 3000,
             )
-        except Exception as e:
-            self.tray_icon.showMessage(
+        )
+        self.export_worker.failed.connect(
+            lambda message: self.tray_icon.showMessage(
                 "Export Error",
-                f"Failed to export: {str(e)}",
+                f"Failed to export: {message}",
                 QSystemTrayIcon.MessageIcon.Critical,
                 3000,
             )
+        )
+        self.export_worker.start()
 
     def setup_hotkeys(self):
         """Setup global hotkeys."""
@@ -165,34 +232,24 @@ class ClipboardHistoryApp:
 
     def update_tray_menu(self):
         """Update tray menu with type-aware recent items."""
-        recent_items = self.db_manager.get_clipboard_history(limit=5)
+        recent_items = self.db_manager.get_clipboard_history_summaries(limit=5)
 
         for i, action in enumerate(self.recent_items_actions):
             if i < len(recent_items):
-                item = recent_items[i]
-                content = item[1]
-                content_type = item[2]
-                file_path = item[3]
-
-                # Create preview based on type
-                if content_type == "file":
-                    preview = f"📁 {os.path.basename(file_path) if file_path else 'File'}"
-                elif content_type == "image":
-                    preview = "🖼️ Image"
-                else:
-                    preview = (
-                        content[:50].replace("\n", " ").replace("\r", " ")
-                    )
-                    if len(content) > 50:
-                        preview += "..."
-                    if self.is_url(content.strip()):
-                        preview = f"🔗 {preview}"
+                item_id, content_type, snippet = recent_items[i][:3]
+
+                # Snippets already carry the type/URL indicator
+                preview = snippet
+                if content_type == "text" and len(snippet) > 50:
+                    preview = snippet[:50].rstrip(".") + "..."
 
                 action.setText(preview)
                 action.setVisible(True)
                 action.triggered.disconnect()
                 action.triggered.connect(
-                    lambda checked, item=item: self.copy_from_tray(item)
+                    lambda checked, item_id=item_id: self.copy_from_tray(
+                        item_id
+                    )
                 )
             else:
                 action.setVisible(False)
@@ -205,8 +262,11 @@ class ClipboardHistoryApp:
         except:  # noqa E722
             return False
 
-    def copy_from_tray(self, item):
+    def copy_from_tray(self, item_id):
         """Copy item to clipboard from tray menu with type handling."""
+        item = self.db_manager.get_item(item_id)
+        if item is None:
+            return
         content = item[1]
         content_type = item[2]
         file_path = item[3]
@@ -224,10 +284,9 @@ class ClipboardHistoryApp:
                 else:
                     clipboard.setText(content)
             elif content_type == "image":
-                image_data = base64.b64decode(content)
-                pixmap = QPixmap()
-                pixmap.loadFromData(image_data)
-                clipboard.setPixmap(pixmap)
+                clipboard.setMimeData(
+                    image_mime_data(image_payload(item), item[5])
+                )
 
             # Show notification
             self.tray_icon.showMessage(
@@ -258,23 +317,33 @@ class ClipboardHistoryApp:
             self.main_widget.load_history()  # Refresh
 
     def on_clipboard_changed(self, content, content_type, metadata):
-        """Handle clipboard changes with enhanced metadata."""
-        success = self.db_manager.add_clipboard_item(
+        """Queue clipboard changes for the writer thread."""
+        if content_type == "image":
+            self._thumbnails_pending = True
+        self.db_writer.add_clipboard_item(
             content=content,
             content_type=content_type,
             file_path=metadata.get("file_path"),
             file_size=metadata.get("file_size"),
             mime_type=metadata.get("mime_type"),
             thumbnail=metadata.get("thumbnail"),
+            payload=metadata.get("payload"),
+            image_width=metadata.get("image_width"),
+            image_height=metadata.get("image_height"),
+            content_hash=metadata.get("content_hash"),
         )
 
-        if success:
+    def on_batch_committed(self, results):
+        """Refresh the tray once a batch of writes has been committed."""
+        if self._thumbnails_pending:
+            # New images are committed; build their thumbnails now
+            self._thumbnails_pending = False
+            self.thumbnail_job.wake()
+        if any(
+            op in ("add", "bump", "delete", "clear", "undo") for op, _ in results
+        ):
             self.update_tray_menu()
 
-            # Update main window if visible
-            if self.main_widget.isVisible():
-                self.main_widget.load_history()
-
     def load_settings(self):
         """Load application settings."""
         if self.settings.contains("geometry"):
@@ -287,10 +356,18 @@ class ClipboardHistoryApp:
     def quit_application(self):
         """Clean shutdown with final backup."""
         try:
+            self.clipboard_monitor.stop()
+            self.main_widget.search_worker.stop()
+            if self.export_worker is not None:
+                self.export_worker.cancel()
+                self.export_worker.wait(2000)
+            # Flush queued writes before the final backup
+            self.db_writer.stop()
+
             # Perform final backup
             self.db_manager.backup_unsynced_items()
             self.save_settings()
-            self.clipboard_monitor.stop()
+            self.db_manager.close()
             self.tray_icon.hide()
             self.app.quit()
         except Exception as e:
@@ -1,27 +1,54 @@
-import base64
-import hashlib
+import mimetypes
 import os
 from datetime import datetime
 from pathlib import Path
 from urllib.parse import urlparse
 
 from PyQt6.QtCore import Qt, QTimer, QMimeData, QUrl
-from PyQt6.QtGui import QPixmap, QDesktopServices
+from PyQt6.QtGui import QDesktopServices
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QLabel, QComboBox, QCheckBox, QPushButton, \
-    QSplitter, QListWidget, QListWidgetItem, QApplication, QMessageBox, QFileDialog, QProgressDialog
+    QSplitter, QListView, QApplication, QMessageBox, QFileDialog, QProgressDialog
 
+from clipboard_monitor import image_mime_data
+from database_manager import UNDO_WINDOW, image_payload
+from export_worker import ExportWorker
+from fingerprints import item_fingerprint
+from history_model import HistoryModel
 from preview_widget import PreviewWidget
+from search_worker import SearchWorker
+
+# Committed writes arriving within this many ms are applied to the list
+# together
+CHANGE_COALESCE_MS = 100
+
+# Quiet time after the last keystroke before a search starts
+SEARCH_DEBOUNCE_MS = 150
 
 
 class ClipboardHistoryWidget(QWidget):
     """Enhanced main widget with file/image support and export functionality."""
 
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, db_writer=None):
         super().__init__()
         self.favorites_checkbox = None
         self.type_filter = None
         self.search_input = None
         self.db_manager = db_manager
+        self.db_writer = db_writer
+        self._selected_item = None
+        self.export_worker = None
+        self._pending_changes = []
+        self.changes_timer = QTimer(self)
+        self.changes_timer.setSingleShot(True)
+        self.changes_timer.timeout.connect(self.apply_pending_changes)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.timeout.connect(self.load_history)
+        # History queries run here, never on the GUI thread
+        self.search_worker = SearchWorker(db_manager)
+        self.search_worker.start()
+        if db_writer is not None:
+            db_writer.batch_committed.connect(self.on_batch_committed)
         self.opened_from_tray = False
         self.init_ui()
         self.load_history()
@@ -75,15 +102,31 @@ class ClipboardHistoryWidget(QWidget):
         clear_btn.clicked.connect(self.clear_history)
         controls_layout.addWidget(clear_btn)
 
+        # Shown for UNDO_WINDOW seconds after a delete or clear
+        self.undo_btn = QPushButton("Undo")
+        self.undo_btn.clicked.connect(self.undo_delete)
+        self.undo_btn.hide()
+        controls_layout.addWidget(self.undo_btn)
+        self.undo_timer = QTimer(self)
+        self.undo_timer.setSingleShot(True)
+        self.undo_timer.timeout.connect(self.undo_btn.hide)
+
         layout.addLayout(controls_layout)
 
         # Main content splitter
         splitter = QSplitter(Qt.Orientation.Horizontal)
 
-        # History list
-        self.history_list = QListWidget()
-        self.history_list.itemClicked.connect(self.on_item_selected)
-        self.history_list.itemDoubleClicked.connect(self.copy_to_clipboard)
+        # History list: a lazily paged model, more rows load while scrolling
+        self.history_model = HistoryModel(
+            self.db_manager, search_worker=self.search_worker, parent=self
+        )
+        self.history_list = QListView()
+        self.history_list.setModel(self.history_model)
+        self.history_list.setUniformItemSizes(True)
+        self.history_list.selectionModel().currentChanged.connect(
+            self.on_item_selected
+        )
+        self.history_list.doubleClicked.connect(self.copy_to_clipboard)
         splitter.addWidget(self.history_list)
 
         # Enhanced preview panel
@@ -145,9 +188,14 @@ class ClipboardHistoryWidget(QWidget):
 
     def load_history(self):
         """Load clipboard history with enhanced filtering."""
-        search_term = self.search_input.text()
-        favorites_only = self.favorites_checkbox.isChecked()
-
+        self.search_timer.stop()
+        # Summaries only, a page at a time on the search worker; payloads
+        # are loaded when an item is selected
+        self._selected_item = None
+        self.history_model.set_filters(self.current_filters())
+
+    def current_filters(self):
+        """page() filters for the search box, type combo and checkbox."""
         # Map UI filter to database values
         type_mapping = {
             "All": "all",
@@ -158,63 +206,48 @@ class ClipboardHistoryWidget(QWidget):
         content_type_filter = type_mapping.get(
             self.type_filter.currentText(), "all"
         )
+        return {
+            "search_term": self.search_input.text(),
+            "favorites_only": self.favorites_checkbox.isChecked(),
+            "content_type_filter": content_type_filter,
+        }
 
-        items = self.db_manager.get_clipboard_history(
-            limit=1000,
-            search_term=search_term,
-            favorites_only=favorites_only,
-            content_type_filter=content_type_filter,
-        )
-
-        self.history_list.clear()
-
-        for item in items:
-            item_id, content, content_type, file_path = item[:4]
-            file_size, mime_type, thumbnail, timestamp = item[4:8]
-            is_favorite, access_count = item[8:10]
-
-            # Create display text based on content type
-            if content_type == "file":
-                display_name = (
-                    os.path.basename(file_path) if file_path else "File"
-                )
-                preview = f"📁 {display_name}"
-                if file_size:
-                    size_mb = file_size / (1024 * 1024)
-                    size_str = (
-                        f"{size_mb:.1f}MB"
-                        if size_mb >= 1
-                        else f"{file_size//1024}KB"
-                    )
-                    preview += f" ({size_str})"
-            elif content_type == "image":
-                preview = f"🖼️ Image ({len(content)} chars)"
-                if file_size:
-                    size_mb = file_size / (1024 * 1024)
-                    size_str = (
-                        f"{size_mb:.1f}MB"
-                        if size_mb >= 1
-                        else f"{file_size//1024}KB"
-                    )
-                    preview += f" ({size_str})"
-            else:
-                preview = content[:100].replace("\n", " ").replace("\r", " ")
-                if len(content) > 100:
-                    preview += "..."
-                # Add URL indicator
-                if self.is_url(content.strip()):
-                    preview = f"🔗 {preview}"
-
-            favorite_mark = "★ " if is_favorite else ""
-            timestamp_str = datetime.fromisoformat(timestamp).strftime(
-                "%m/%d %H:%M"
-            )
-
-            display_text = f"{favorite_mark}[{timestamp_str}] {preview}"
-
-            list_item = QListWidgetItem(display_text)
-            list_item.setData(Qt.ItemDataRole.UserRole, item)
-            self.history_list.addItem(list_item)
+    def current_summary(self):
+        """Summary tuple of the current list row, or None."""
+        index = self.history_list.currentIndex()
+        if not index.isValid():
+            return None
+        return self.history_model.summary(index.row())
+
+    def current_item_data(self):
+        """Full item tuple for the current list row, loaded on demand."""
+        summary = self.current_summary()
+        if not summary:
+            return None
+        cached = self._selected_item
+        if cached is None or cached[0] != summary[0]:
+            cached = self._selected_item = self.db_manager.get_item(summary[0])
+        return cached
+
+    def on_batch_committed(self, results):
+        """Queue committed writes for the list; a burst is applied at once."""
+        if not self.isVisible():
+            return  # the list is reloaded when the window is shown
+        self._pending_changes.extend(results)
+        if not self.changes_timer.isActive():
+            self.changes_timer.start(CHANGE_COALESCE_MS)
+
+    def apply_pending_changes(self):
+        """Update just the list rows the queued writes touched."""
+        changes, self._pending_changes = self._pending_changes, []
+        if not changes:
+            return
+        selected = self._selected_item
+        if selected is not None and any(
+            item_id == selected[0] for _, item_id in changes
+        ):
+            self._selected_item = None  # re-read with its new state
+        self.history_model.apply_changes(changes)
 
     def is_url(self, text):
         """Check if text is a URL."""
@@ -225,19 +258,18 @@ class ClipboardHistoryWidget(QWidget):
             return False
 
     def on_search(self):
-        """Handle search with debouncing."""
-        if hasattr(self, "search_timer"):
-            self.search_timer.stop()
-
-        self.search_timer = QTimer()
-        self.search_timer.setSingleShot(True)
-        self.search_timer.timeout.connect(self.load_history)
-        self.search_timer.start(300)
+        """Handle search with debouncing; each keystroke restarts the timer."""
+        if self.history_model.in_memory(self.current_filters()):
+            # Narrowing a finished search, or one seen before: no query,
+            # so no reason to wait
+            self.load_history()
+        else:
+            self.search_timer.start(SEARCH_DEBOUNCE_MS)
 
-    def on_item_selected(self, item):
+    def on_item_selected(self, index):
         """Handle item selection with enhanced preview."""
-        if item:
-            item_data = item.data(Qt.ItemDataRole.UserRole)
+        if index.isValid():
+            item_data = self.current_item_data()
             if item_data:
                 self.preview_widget.display_content(item_data)
                 is_favorite = item_data[8]
@@ -282,87 +314,85 @@ class ClipboardHistoryWidget(QWidget):
 
     def copy_to_clipboard(self):
         """Copy selected item to clipboard with type handling."""
-        current_item = self.history_list.currentItem()
-        if current_item:
-            item_data = current_item.data(Qt.ItemDataRole.UserRole)
-            if item_data:
-                content = item_data[1]
-                content_type = item_data[2]
-
-                # Mark the next clipboard change as self-initiated so the monitor ignores it once
-                app = QApplication.instance()
-                content_hash = hashlib.sha256(
-                    str(content).encode("utf-8", errors="ignore")
-                ).hexdigest()
-                app.setProperty("clip_skip_once", True)
-                app.setProperty("clip_skip_hash", content_hash)
-
-                clipboard = QApplication.clipboard()
-
-                if content_type == "text":
-                    clipboard.setText(content)
-                elif content_type == "file":
-                    file_path = item_data[3]
-                    if file_path and os.path.exists(file_path):
-                        mime_data = QMimeData()
-                        mime_data.setUrls([QUrl.fromLocalFile(file_path)])
-                        clipboard.setMimeData(mime_data)
-                    else:
-                        clipboard.setText(content)  # Fallback to text
-                elif content_type == "image":
-                    try:
-                        image_data = base64.b64decode(content)
-                        pixmap = QPixmap()
-                        pixmap.loadFromData(image_data)
-                        clipboard.setPixmap(pixmap)
-                    except Exception:
-                        clipboard.setText(content)  # Fallback to text
-
-                self.show_status_message("Copied to clipboard!")
+        item_data = self.current_item_data()
+        if item_data:
+            content = item_data[1]
+            content_type = item_data[2]
+
+            # Mark the next clipboard change as self-initiated so the monitor ignores it once
+            app = QApplication.instance()
+            payload = None
+            if content_type == "image":
+                payload = image_payload(item_data)
+            content_hash = item_data[14]
+            if not isinstance(content_hash, bytes):
+                # Legacy row that hasn't been re-keyed yet
+                content_hash = item_fingerprint(content, payload)
+            app.setProperty("clip_skip_once", True)
+            app.setProperty("clip_skip_hash", content_hash.hex())
+
+            clipboard = QApplication.clipboard()
+
+            if content_type == "text":
+                clipboard.setText(content)
+            elif content_type == "file":
+                file_path = item_data[3]
+                if file_path and os.path.exists(file_path):
+                    mime_data = QMimeData()
+                    mime_data.setUrls([QUrl.fromLocalFile(file_path)])
+                    clipboard.setMimeData(mime_data)
+                else:
+                    clipboard.setText(content)  # Fallback to text
+            elif content_type == "image":
+                clipboard.setMimeData(image_mime_data(payload, item_data[5]))
+
+            self.show_status_message("Copied to clipboard!")
 
     def open_item(self):
         """Open/view the selected item."""
-        current_item = self.history_list.currentItem()
-        if current_item:
-            item_data = current_item.data(Qt.ItemDataRole.UserRole)
-            if item_data:
-                content = item_data[1]
-                content_type = item_data[2]
-                file_path = item_data[3]
-
-                if content_type == "file" and file_path:
-                    # Open file with default application
-                    if os.path.exists(file_path):
-                        QDesktopServices.openUrl(QUrl.fromLocalFile(file_path))
-                    else:
-                        QMessageBox.warning(
-                            self,
-                            "File Not Found",
-                            f"The file {file_path} no longer exists.",
-                        )
-                elif content_type == "text" and self.is_url(content.strip()):
-                    # Open URL in browser
-                    QDesktopServices.openUrl(QUrl(content.strip()))
-                elif content_type == "image":
-                    # Save and open image temporarily
-                    try:
-                        image_data = base64.b64decode(content)
-                        temp_path = Path.home() / "temp_clipboard_image.png"
-                        with open(temp_path, "wb") as f:
-                            f.write(image_data)
-                        QDesktopServices.openUrl(
-                            QUrl.fromLocalFile(str(temp_path))
-                        )
-                    except Exception as e:
-                        QMessageBox.warning(
-                            self, "Error", f"Cannot open image: {e}"
-                        )
+        item_data = self.current_item_data()
+        if item_data:
+            content = item_data[1]
+            content_type = item_data[2]
+            file_path = item_data[3]
+
+            if content_type == "file" and file_path:
+                # Open file with default application
+                if os.path.exists(file_path):
+                    QDesktopServices.openUrl(QUrl.fromLocalFile(file_path))
                 else:
-                    QMessageBox.information(
+                    QMessageBox.warning(
                         self,
-                        "Info",
-                        "No appropriate viewer for this content type.",
+                        "File Not Found",
+                        f"The file {file_path} no longer exists.",
+                    )
+            elif content_type == "text" and self.is_url(content.strip()):
+                # Open URL in browser
+                QDesktopServices.openUrl(QUrl(content.strip()))
+            elif content_type == "image":
+                # Save and open image temporarily
+                try:
+                    image_data = image_payload(item_data)
+                    suffix = (
+                        mimetypes.guess_extension(item_data[5] or "")
+                        or ".png"
+                    )
+                    temp_path = Path.home() / f"temp_clipboard_image{suffix}"
+                    with open(temp_path, "wb") as f:
+                        f.write(image_data)
+                    QDesktopServices.openUrl(
+                        QUrl.fromLocalFile(str(temp_path))
+                    )
+                except Exception as e:
+                    QMessageBox.warning(
+                        self, "Error", f"Cannot open image: {e}"
                     )
+            else:
+                QMessageBox.information(
+                    self,
+                    "Info",
+                    "No appropriate viewer for this content type.",
+                )
 
     def show_status_message(self, message):
         """Show a temporary status message."""
@@ -371,34 +401,40 @@ class ClipboardHistoryWidget(QWidget):
 
     def toggle_favorite(self):
         """Toggle favorite status of selected item."""
-        current_item = self.history_list.currentItem()
-        if current_item:
-            item_data = current_item.data(Qt.ItemDataRole.UserRole)
-            if item_data:
-                item_id = item_data[0]
+        item_data = self.current_summary()
+        if item_data:
+            item_id = item_data[0]
+            if self.db_writer is not None:
+                # List updates from on_batch_committed
+                self.db_writer.toggle_favorite(item_id)
+            else:
                 self.db_manager.toggle_favorite(item_id)
-                self.load_history()
+                self._selected_item = None
+                self.history_model.apply_changes([("favorite", item_id)])
 
     def delete_item(self):
         """Delete selected item."""
-        current_item = self.history_list.currentItem()
-        if current_item:
-            item_data = current_item.data(Qt.ItemDataRole.UserRole)
-            if item_data:
-                item_id = item_data[0]
+        item_data = self.current_summary()
+        if item_data:
+            item_id = item_data[0]
 
-                reply = QMessageBox.question(
-                    self,
-                    "Confirm Delete",
-                    "Are you sure you want to delete this item?",
-                    QMessageBox.StandardButton.Yes
-                    | QMessageBox.StandardButton.No,
-                )
+            reply = QMessageBox.question(
+                self,
+                "Confirm Delete",
+                "Are you sure you want to delete this item?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            )
 
-                if reply == QMessageBox.StandardButton.Yes:
+            if reply == QMessageBox.StandardButton.Yes:
+                if self.db_writer is not None:
+                    self.db_writer.delete_item(item_id)
+                    # Hide it now rather than once the write lands
+                    self.history_model.remove_item(item_id)
+                else:
                     self.db_manager.delete_item(item_id)
-                    self.load_history()
-                    self.preview_widget.clear_content()
+                    self.history_model.remove_item(item_id)
+                self.preview_widget.clear_content()
+                self.offer_undo()
 
     def clear_history(self):
         """Clear clipboard history."""
@@ -410,27 +446,46 @@ class ClipboardHistoryWidget(QWidget):
         )
 
         if reply == QMessageBox.StandardButton.Yes:
-            self.db_manager.clear_history(keep_favorites=True)
-            self.load_history()
+            # Instant: rows are hidden now and purged in the background
+            if self.db_writer is not None:
+                # Queued in order with pending deletes; list refreshes on commit
+                self.db_writer.clear_history(keep_favorites=True)
+            else:
+                self.db_manager.clear_history(keep_favorites=True)
+                self.load_history()
             self.preview_widget.clear_content()
+            self.offer_undo()
+
+    def offer_undo(self):
+        """Show the Undo button for as long as the delete can be undone."""
+        self.undo_btn.show()
+        self.undo_timer.start(UNDO_WINDOW * 1000)
+
+    def undo_delete(self):
+        """Restore the most recent delete or clear."""
+        self.undo_timer.stop()
+        self.undo_btn.hide()
+        if self.db_writer is not None:
+            # Queued behind any pending delete; list refreshes on commit
+            self.db_writer.undo_delete()
+        else:
+            self.db_manager.undo_delete()
+            self.load_history()
 
     def export_history(self):
-        """Export clipboard history to JSON."""
+        """Export clipboard history to JSON on a background thread."""
         # Ask user for export options
-        favorites_only = (
-            QMessageBox.question(
-                self,
-                "Export Options",
-                "Export only favorites?\n\nYes = Favorites only\nNo = All items",
-                QMessageBox.StandardButton.Yes
-                | QMessageBox.StandardButton.No
-                | QMessageBox.StandardButton.Cancel,
-            )
-            == QMessageBox.StandardButton.Yes
+        reply = QMessageBox.question(
+            self,
+            "Export Options",
+            "Export only favorites?\n\nYes = Favorites only\nNo = All items",
+            QMessageBox.StandardButton.Yes
+            | QMessageBox.StandardButton.No
+            | QMessageBox.StandardButton.Cancel,
         )
-
-        if favorites_only == QMessageBox.StandardButton.Cancel:
+        if reply == QMessageBox.StandardButton.Cancel:
             return
+        favorites_only = reply == QMessageBox.StandardButton.Yes
 
         # Get file path
         file_path, _ = QFileDialog.getSaveFileName(
@@ -440,35 +495,49 @@ class ClipboardHistoryWidget(QWidget):
             "JSON Files (*.json);;All Files (*)",
         )
 
-        if file_path:
-            try:
-                # Show progress dialog
-                progress = QProgressDialog(
-                    "Exporting clipboard history...", "Cancel", 0, 100, self
-                )
-                progress.setWindowModality(Qt.WindowModality.WindowModal)
-                progress.show()
+        if not file_path:
+            return
+        if self.export_worker is not None and self.export_worker.isRunning():
+            QMessageBox.information(
+                self, "Export", "An export is already in progress."
+            )
+            return
 
-                QApplication.processEvents()
-                progress.setValue(50)
+        # Progress reflects rows actually written; Cancel stops the worker
+        progress = QProgressDialog(
+            "Exporting clipboard history...", "Cancel", 0, 0, self
+        )
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
 
-                # Export data
-                item_count = self.db_manager.export_to_json(
-                    file_path, favorites_only
-                )
+        worker = ExportWorker(self.db_manager, file_path, favorites_only)
+        self.export_worker = worker
 
-                progress.setValue(100)
-                progress.close()
+        def on_progress(done, total):
+            progress.setMaximum(max(total, 1))
+            progress.setValue(done)
 
-                QMessageBox.information(
-                    self,
-                    "Export Complete",
-                    f"Successfully exported {item_count} items to:\n{file_path}",
-                )
+        def on_completed(item_count):
+            progress.close()
+            QMessageBox.information(
+                self,
+                "Export Complete",
+                f"Successfully exported {item_count} items to:\n{file_path}",
+            )
 
-            except Exception as e:
-                QMessageBox.critical(
-                    self,
-                    "Export Error",
-                    f"Failed to export clipboard history:\n{str(e)}",
-                )
+        def on_failed(message):
+            progress.close()
+            QMessageBox.critical(
+                self,
+                "Export Error",
+                f"Failed to export clipboard history:\n{message}",
+            )
+
+        worker.progress.connect(on_progress)
+        worker.completed.connect(on_completed)
+        worker.failed.connect(on_failed)
+        worker.cancelled.connect(progress.close)
+        progress.canceled.connect(worker.cancel)
+        progress.show()
+        worker.start()
@@ -1,41 +1,93 @@
-import base64
-import hashlib
-import mimetypes
 import os
 from collections import deque
-from time import monotonic
-from urllib.parse import urlparse
+from time import monotonic, perf_counter
 
-from PyQt6.QtCore import QThread, pyqtSignal, QMimeData, QBuffer, QIODevice, Qt
-from PyQt6.QtGui import QClipboard, QImage, QPixmap
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal, QMimeData, QByteArray
+from PyQt6.QtGui import QClipboard, QImage
 from PyQt6.QtWidgets import QApplication
 
+from ingest_pipeline import IngestPipeline, is_url
 
-class ClipboardMonitor(QThread):
-    """Enhanced clipboard monitor supporting files and images with self-copy suppression and debouncing."""
+# Already-compressed formats stored as offered, in order of preference:
+# lossless PNG first, since an app offering it next to JPEG/WebP may have
+# made the lossy copy on the fly; those are only taken when no PNG is
+# offered. Anything else (BMP, TIFF, DIB...) is decoded and re-encoded as PNG.
+NATIVE_IMAGE_FORMATS = ("image/png", "image/webp", "image/jpeg")
+
+
+def image_mime_data(data, mime_type=None):
+    """
+    Build clipboard data for a stored image.
+
+    The original encoded bytes are offered under their own mime type next to
+    the decoded image, so pasting keeps the source format and the monitor
+    sees exactly the bytes we stored.
+    """
+    mime_data = QMimeData()
+    image = QImage.fromData(data)
+    if not image.isNull():
+        mime_data.setImageData(image)
+    if mime_type in NATIVE_IMAGE_FORMATS:
+        mime_data.setData(mime_type, QByteArray(data))
+    return mime_data
+
+
+class ClipboardMonitor(QObject):
+    """
+    Event-driven clipboard monitor supporting files and images with
+    self-copy suppression and debouncing.
+
+    Lives on the GUI thread and only reads the clipboard when Qt reports a
+    change (QClipboard.dataChanged, plus selectionChanged when
+    watch_selection is set and the platform has a selection clipboard).
+    Polling is an optional fallback for platforms that don't deliver change
+    notifications to background apps.
+
+    Only the capture stage runs here; everything after it happens in an
+    IngestPipeline, which calls back into the monitor for dedupe.
+    """
 
     clipboard_changed = pyqtSignal(str, str, dict)  # content, type, metadata
 
-    def __init__(self, dedupe_window_seconds: float = 1.0):
+    # Platforms known to drop dataChanged while the app has no focus,
+    # matched as prefixes of the plugin name ("wayland", "wayland-egl", ...)
+    POLL_FALLBACK_PLATFORMS = ("wayland",)
+
+    def __init__(
+        self,
+        dedupe_window_seconds: float = 1.0,
+        poll_interval_ms: int | None = None,
+        watch_selection: bool = False,
+        max_workers: int = 2,
+        max_pending: int = 8,
+    ):
+        """
+        poll_interval_ms: None = poll only where notifications are unreliable,
+        0 = never poll, >0 = also poll at this interval.
+        watch_selection: also capture the X11 primary selection (off by
+        default because it changes on every text highlight).
+        max_workers/max_pending: ingest pool size and how many heavy
+        captures may wait for it.
+        """
         super().__init__()
-        self.running = True
-        self.last_content_hash = ""
+        self.running = False
+        self.last_content_hash = b""
         self._recent = deque(maxlen=16)  # (hash, t)
         self._dedupe_window = float(dedupe_window_seconds)
+        self._poll_interval_ms = poll_interval_ms
+        self._watch_selection = watch_selection
+        self._clipboard = None
+        self._poll_timer = None
+        self._last_capture_key = None
 
-    # ---------- Helpers ----------
+        self.pipeline = IngestPipeline(
+            self._accept, max_workers=max_workers, max_pending=max_pending
+        )
+        self.pipeline.item_ready.connect(self.clipboard_changed)
 
-    @staticmethod
-    def _hash_content(content: str) -> str:
-        try:
-            return hashlib.sha256(
-                content.encode("utf-8", errors="ignore")
-            ).hexdigest()
-        except Exception:
-            # Extremely defensive; ensures we never blow up hashing
-            return ""
+    # ---------- Helpers ----------
 
-    def _is_recent(self, h: str) -> bool:
+    def _is_recent(self, h: bytes) -> bool:
         now = monotonic()
         # prune old
         while (
@@ -45,7 +97,7 @@ class ClipboardMonitor(QThread):
         # check
         return any(h == rh for rh, _ in self._recent)
 
-    def _remember(self, h: str) -> None:
+    def _remember(self, h: bytes) -> None:
         if h:
             self._recent.append((h, monotonic()))
 
@@ -53,7 +105,7 @@ class ClipboardMonitor(QThread):
         """
         UI will set:
           app.setProperty("clip_skip_once", True)
-          app.setProperty("clip_skip_hash", "<sha256>")
+          app.setProperty("clip_skip_hash", "<content_hash hex>")
         We skip exactly once if True and (hash matches OR property has no hash).
         """
         try:
@@ -82,63 +134,96 @@ class ClipboardMonitor(QThread):
             app.setProperty("clip_skip_hash", "")
             return False
 
-    # ---------- Main loop ----------
+    def _accept(self, content_hash: bytes) -> bool:
+        """Dedupe stage: decide whether a fingerprinted item is new."""
+        if not content_hash:
+            return False
+        app: QApplication = QApplication.instance()
 
-    def run(self):
-        """Main monitoring loop."""
+        # 1) Do we need to skip because our own UI just set this?
+        if self._should_skip_for_self_copy(app, content_hash.hex()):
+            self.last_content_hash = content_hash
+            self._remember(content_hash)
+            return False
+
+        # 2) Debounce rapid repeats
+        if self._is_recent(content_hash):
+            return False
+
+        if content_hash == self.last_content_hash:
+            return False
+        self.last_content_hash = content_hash
+        self._remember(content_hash)
+        return True
+
+    # ---------- Change notifications ----------
+
+    def start(self):
+        """Start listening for clipboard changes."""
         app: QApplication = QApplication.instance()
-        if app is None:
+        if app is None or self.running:
             # Very defensive: without an app, monitoring can't proceed
             return
 
-        clipboard: QClipboard = app.clipboard()
+        self.running = True
+        self._clipboard = app.clipboard()
+        self._clipboard.dataChanged.connect(self._on_data_changed)
+        if self._watch_selection and self._clipboard.supportsSelection():
+            self._clipboard.selectionChanged.connect(self._on_selection_changed)
+
+        interval = self._poll_interval_ms
+        if interval is None:
+            platform = QApplication.platformName().lower()
+            polls = platform.startswith(self.POLL_FALLBACK_PLATFORMS)
+            interval = 500 if polls else 0
+        if interval > 0:
+            self._poll_timer = QTimer(self)
+            self._poll_timer.timeout.connect(self._on_data_changed)
+            self._poll_timer.start(interval)
+
+        # Pick up whatever is on the clipboard right now
+        self.check_clipboard()
+
+    def _on_data_changed(self):
+        self.check_clipboard(QClipboard.Mode.Clipboard)
+
+    def _on_selection_changed(self):
+        self.check_clipboard(QClipboard.Mode.Selection)
+
+    def check_clipboard(self, mode=QClipboard.Mode.Clipboard):
+        """Capture the clipboard once and hand anything new to the pipeline."""
+        if not self.running or self._clipboard is None:
+            return
 
-        while self.running:
-            try:
-                mime_data = clipboard.mimeData()
-                if mime_data is None:
-                    self.msleep(200)
-                    continue
-
-                content, content_type, metadata = self.process_clipboard_data(
-                    mime_data
-                )
-
-                if content:
-                    content_hash = self._hash_content(str(content))
-
-                    # 1) Do we need to skip because our own UI just set this?
-                    if self._should_skip_for_self_copy(app, content_hash):
-                        self.last_content_hash = content_hash
-                        self._remember(content_hash)
-                        self.msleep(200)
-                        continue
-
-                    # 2) Debounce rapid repeats
-                    if self._is_recent(content_hash):
-                        self.msleep(200)
-                        continue
-
-                    if content_hash != self.last_content_hash:
-                        self.clipboard_changed.emit(
-                            content, content_type, metadata
-                        )
-                        self.last_content_hash = content_hash
-                        self._remember(content_hash)
-
-                self.msleep(200)  # Check every 200ms
-
-            except Exception as e:
-                # Don't loop-spin on errors; slow down and keep going
-                print(f"Clipboard monitor error: {e}")
-                self.msleep(750)
+        try:
+            started = perf_counter()
+            mime_data = self._clipboard.mimeData(mode)
+            captured = None
+            if mime_data is not None:
+                captured = self.capture_clipboard_data(mime_data)
+            self.pipeline.record("capture", perf_counter() - started)
+            if captured is None:
+                return
+
+            # Polling (and some platforms) report the same contents over and
+            # over; don't push identical captures through the pipeline
+            key, item = captured
+            if key == self._last_capture_key:
+                return
+            self._last_capture_key = key
+            self.pipeline.submit(*item)
 
-    def process_clipboard_data(self, mime_data: QMimeData):
-        """Process clipboard data and determine type."""
-        content = ""
-        content_type = "text"
-        metadata = {}
+        except Exception as e:
+            # Never let a bad clipboard payload break notifications
+            print(f"Clipboard monitor error: {e}")
 
+    def capture_clipboard_data(self, mime_data: QMimeData):
+        """
+        Capture stage: copy what's on the clipboard, doing no real work.
+
+        Returns (capture_key, (content, content_type, metadata)) or None.
+        The key is a cheap identity for the raw clipboard contents.
+        """
         try:
             # Files (URLs)
             if mime_data.hasUrls():
@@ -148,95 +233,73 @@ class ClipboardMonitor(QThread):
                     if url.isLocalFile():
                         file_path = url.toLocalFile()
                         if file_path and os.path.exists(file_path):
-                            content = file_path
-                            content_type = "file"
-
-                            # Get file metadata
-                            try:
-                                stat = os.stat(file_path)
-                                metadata = {
-                                    "file_path": file_path,
-                                    "file_size": stat.st_size,
-                                    "mime_type": mimetypes.guess_type(
-                                        file_path
-                                    )[0]
-                                    or "application/octet-stream",
-                                    "thumbnail": self.create_file_thumbnail(
-                                        file_path
-                                    ),
-                                }
-                            except Exception:
-                                metadata = {"file_path": file_path}
-                            return content, content_type, metadata
-
-            # Images
+                            return (
+                                ("file", file_path),
+                                (file_path, "file", {"file_path": file_path}),
+                            )
+
+            # Images, preferring bytes the source app already encoded.
+            # hasImage() only reports decodable image data, so native
+            # formats are looked up directly.
+            formats = set(mime_data.formats())
+            for mime_type in NATIVE_IMAGE_FORMATS:
+                if mime_type in formats:
+                    data = bytes(mime_data.data(mime_type))
+                    if data:
+                        metadata = {"mime_type": mime_type, "payload": data}
+                        return ("image", data), ("", "image", metadata)
+
             if mime_data.hasImage():
                 _image = mime_data.imageData()
                 if isinstance(_image, QImage) and (not _image.isNull()):
-                    pixmap = QPixmap.fromImage(_image)
-
-                    buffer = QBuffer()
-                    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
-                    pixmap.save(buffer, "PNG")
-                    image_bytes = bytes(buffer.data())
-                    content = base64.b64encode(image_bytes).decode("ascii")
-                    content_type = "image"
-
-                    metadata = {
-                        "mime_type": "image/png",
-                        "file_size": len(image_bytes),
-                        "thumbnail": image_bytes,  # raw bytes for preview/thumbnail
-                    }
-                    return content, content_type, metadata
+                    # cacheKey() is free and stable while the clipboard holds
+                    # the same shared image; identical copies are caught
+                    # later by the pixel fingerprint
+                    return (
+                        ("qimage", _image.cacheKey()),
+                        ("", "image", {"image": _image}),
+                    )
 
             # Text
             if mime_data.hasText():
                 text = (mime_data.text() or "").strip()
                 if text:
-                    content = text
-                    content_type = "text"
-                    if self.is_url(text):
-                        metadata["is_url"] = True
-                    return content, content_type, metadata
+                    return ("text", text), (text, "text", {})
 
         except Exception as e:
             print(f"Error processing clipboard data: {e}")
 
-        return "", "text", {}
-
-    def create_file_thumbnail(self, file_path):
-        """Create thumbnail for file if possible."""
-        try:
-            mime_type, _ = mimetypes.guess_type(file_path)
-            if mime_type and mime_type.startswith("image/"):
-                pixmap = QPixmap(file_path)
-                if not pixmap.isNull():
-                    thumbnail = pixmap.scaled(
-                        64,
-                        64,
-                        Qt.AspectRatioMode.KeepAspectRatio,
-                        Qt.TransformationMode.SmoothTransformation,
-                    )
-                    buffer = QBuffer()
-                    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
-                    thumbnail.save(buffer, "PNG")
-                    return bytes(buffer.data())
-        except Exception as e:
-            print(f"Error creating thumbnail: {e}")
         return None
 
+    def process_clipboard_data(self, mime_data: QMimeData):
+        """Capture and fully process clipboard data synchronously."""
+        captured = self.capture_clipboard_data(mime_data)
+        if captured is not None:
+            item = self.pipeline.run_stages(*captured[1])
+            if item is not None:
+                return item
+        return "", "text", {}
+
     def is_url(self, text):
         """Check if text looks like a URL."""
-        try:
-            result = urlparse(text)
-            return all([result.scheme, result.netloc])
-        except Exception:
-            return False
+        return is_url(text)
 
     def stop(self):
-        """Stop the monitoring thread."""
+        """Stop listening for clipboard changes and shut the pipeline down."""
+        if not self.running:
+            return
         self.running = False
-        try:
-            self.wait(1500)
-        except Exception:
-            pass
+        if self._poll_timer is not None:
+            self._poll_timer.stop()
+            self._poll_timer = None
+        if self._clipboard is not None:
+            try:
+                self._clipboard.dataChanged.disconnect(self._on_data_changed)
+                if self._watch_selection and self._clipboard.supportsSelection():
+                    self._clipboard.selectionChanged.disconnect(
+                        self._on_selection_changed
+                    )
+            except TypeError:
+                pass
+            self._clipboard = None
+        self.pipeline.shutdown()
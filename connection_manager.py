@@ -0,0 +1,183 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from background_jobs import PeriodicJob
+
+
+class WalCheckpointJob(PeriodicJob):
+    """Periodically run a passive WAL checkpoint so the -wal file stays small."""
+
+    name = "wal-checkpoint"
+
+    def __init__(self, connections, interval_seconds: float = 30.0):
+        super().__init__(interval_seconds)
+        self.connections = connections
+
+    def step(self):
+        # PASSIVE never waits on readers or the writer; it copies what it can
+        self.connections.reader().execute("PRAGMA wal_checkpoint(PASSIVE)")
+        return False
+
+
+class ConnectionManager:
+    """
+    Long-lived SQLite connections for one database file.
+
+    A single writer connection is shared (guarded by a lock) and every thread
+    gets its own reader connection. All connections run in WAL mode so
+    readers never block the writer and vice versa.
+    """
+
+    def __init__(
+        self,
+        db_path,
+        synchronous="NORMAL",
+        cache_size=-32768,  # negative = KiB, so 32 MiB
+        mmap_size=256 * 1024 * 1024,
+        temp_store="MEMORY",
+        busy_timeout_ms=5000,
+        checkpoint_interval=30.0,
+        auto_vacuum="INCREMENTAL",
+    ):
+        self.db_path = str(db_path)
+        self.synchronous = synchronous
+        self.cache_size = int(cache_size)
+        self.mmap_size = int(mmap_size)
+        self.temp_store = temp_store
+        self.busy_timeout_ms = int(busy_timeout_ms)
+
+        self._write_lock = threading.RLock()
+        self._local = threading.local()
+        self._readers = {}  # thread -> its reader connection
+        self._readers_lock = threading.Lock()
+        self._functions = []
+        self._closed = False
+        # Bumped after every commit that changed rows; see writer()
+        self.write_generation = 0
+        self._changes_seen = 0
+
+        self._writer = self._connect()
+        # Only takes effect on a new database, and only before WAL mode is
+        # switched on; INCREMENTAL lets pruned pages be handed back later
+        self._writer.execute(f"PRAGMA auto_vacuum = {auto_vacuum}")
+        self._writer.execute("PRAGMA journal_mode=WAL")
+
+        self._checkpoint_job = None
+        if checkpoint_interval:
+            self._checkpoint_job = WalCheckpointJob(self, checkpoint_interval)
+            self._checkpoint_job.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+        )
+        conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout_ms}")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute(f"PRAGMA cache_size = {self.cache_size}")
+        conn.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+        conn.execute(f"PRAGMA temp_store = {self.temp_store}")
+        for name, num_params, func in self._functions:
+            conn.create_function(name, num_params, func, deterministic=True)
+        return conn
+
+    def create_function(self, name, num_params, func):
+        """
+        Register a SQL function on every connection, current and future.
+
+        Needed for anything triggers or views call, since any connection
+        may end up firing them.
+        """
+        self._functions.append((name, num_params, func))
+        with self._write_lock:
+            self._writer.create_function(
+                name, num_params, func, deterministic=True
+            )
+        with self._readers_lock:
+            for conn in self._readers.values():
+                conn.create_function(name, num_params, func, deterministic=True)
+
+    @contextmanager
+    def writer(self):
+        """
+        Yield the shared writer connection inside a transaction.
+
+        Commits on success, rolls back on error. Re-entrant on the same
+        thread, so helpers can nest without committing early. A commit that
+        inserted, updated or deleted any row (triggers included) bumps
+        write_generation, after the data is visible to readers.
+        """
+        with self._write_lock:
+            depth = getattr(self._local, "write_depth", 0)
+            self._local.write_depth = depth + 1
+            try:
+                yield self._writer
+                if depth == 0:
+                    self._writer.commit()
+                    if self._writer.total_changes != self._changes_seen:
+                        self._changes_seen = self._writer.total_changes
+                        self.write_generation += 1
+            except BaseException:
+                if depth == 0:
+                    self._writer.rollback()
+                raise
+            finally:
+                self._local.write_depth = depth
+
+    def reader(self):
+        """Return this thread's reader connection, opening it on first use."""
+        conn = getattr(self._local, "reader", None)
+        if conn is None:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Connection manager is closed")
+            conn = self._connect()
+            self._local.reader = conn
+            with self._readers_lock:
+                self._readers[threading.current_thread()] = conn
+                # Python threads that exited without release_reader()
+                dead = [t for t in self._readers if not t.is_alive()]
+                stale = [self._readers.pop(t) for t in dead]
+            for old in stale:
+                old.close()
+        return conn
+
+    def release_reader(self):
+        """
+        Close this thread's reader connection, if it has one.
+
+        Short-lived threads should call this before they finish, or their
+        connection (and its WAL read slot) stays open until close(). Qt
+        threads must: Python can't tell when one of those has exited.
+        """
+        conn = getattr(self._local, "reader", None)
+        if conn is None:
+            return
+        self._local.reader = None
+        with self._readers_lock:
+            self._readers.pop(threading.current_thread(), None)
+        conn.close()
+
+    def close(self):
+        """Stop background work and close every connection."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._checkpoint_job is not None:
+            self._checkpoint_job.stop()
+        with self._readers_lock:
+            readers, self._readers = list(self._readers.values()), {}
+        for conn in readers:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        with self._write_lock:
+            try:
+                # Recommended on close; only analyzes what needs it
+                self._writer.execute("PRAGMA optimize")
+                self._writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error:
+                pass
+            self._writer.close()
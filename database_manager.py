@@ -1,62 +1,753 @@
 import base64
-import hashlib
 import json
+import os
 import sqlite3
 from datetime import datetime
 from pathlib import Path
+from time import monotonic
+from urllib.parse import urlparse
+
+from backup_journal import BackupJournal
+from blob_store import BlobGarbageCollectionJob, BlobStore
+from connection_manager import ConnectionManager
+from fingerprints import item_fingerprint
+from query_cache import QUERY_CACHE_BYTES, QueryCache
+from search_query import (
+    fts_match_expression,
+    like_pattern,
+    parse_search_terms,
+    split_terms,
+)
+from search_refine import SearchCandidates
+from text_compression import COMPRESS_THRESHOLD, TextCompressor
+
+# Content types that go into the full-text index (never images)
+INDEXED_TYPES = ("text", "file")
+
+# Bumped whenever _migrate() learns a new step (stored in PRAGMA user_version)
+SCHEMA_VERSION = 11
+
+# Columns returned for a full history item, in tuple order (read from the
+# clipboard_history view, which joins clip_meta and clip_payload)
+ITEM_COLUMNS = (
+    "id, content, content_type, file_path, file_size, mime_type, thumbnail, "
+    "timestamp, is_favorite, access_count, payload, image_width, image_height, "
+    "preview_thumbnail, content_hash, blob_key, codec"
+)
+
+# Lightweight list projection over clip_meta (aliased `h`); only rows whose
+# snippet hasn't been backfilled yet look at clip_payload
+SUMMARY_COLUMNS = (
+    "id, content_type, COALESCE(display_snippet, "
+    "(SELECT substr(clip_text(content, blob_key, codec), 1, 100) "
+    "FROM clip_payload WHERE id = h.id AND h.content_type != 'image'), ''), "
+    "flags, strftime('%m/%d %H:%M', timestamp), is_favorite, access_count, seq"
+)
+
+# Next value of the monotonic `seq` column (evaluated inside the writer txn)
+NEXT_SEQ = "(SELECT COALESCE(MAX(seq), 0) + 1 FROM clip_meta)"
+
+# Rows of clip_meta/clipboard_history (aliased `h`) not hidden by a pending
+# delete or clear; see delete_item() and clear_history(). History queries
+# also bound seq by the newest clears (see _clear_bounds), so rows a clear
+# hid are skipped by an index range rather than scanned one by one.
+VISIBLE = (
+    "h.deleted_by IS NULL AND NOT EXISTS ("
+    "SELECT 1 FROM deletions AS d WHERE d.max_seq >= h.seq "
+    "AND (h.is_favorite = 0 OR d.keep_favorites = 0))"
+)
+
+# Seconds a delete or clear can be undone before PurgeJob removes the rows
+UNDO_WINDOW = 30
+
+# Bits in the `flags` column
+FLAG_URL = 1
+
+SNIPPET_LENGTH = 100
+
+# Payloads (or text, UTF-8 encoded) larger than this go to the blob store
+BLOB_THRESHOLD = 64 * 1024
+
+
+def image_payload(item):
+    """Return the raw image bytes of a history item tuple."""
+    payload = item[10] if len(item) > 10 else None
+    if payload:
+        return bytes(payload)
+    # Row not migrated yet: image still lives base64-encoded in `content`
+    return base64.b64decode(item[1])
+
+
+def png_dimensions(data):
+    """Read (width, height) from a PNG header, or (None, None)."""
+    if len(data) >= 24 and data[:8] == b"\x89PNG\r\n\x1a\n":
+        return (
+            int.from_bytes(data[16:20], "big"),
+            int.from_bytes(data[20:24], "big"),
+        )
+    return None, None
+
+
+def format_size(size):
+    """Human readable size used in list snippets."""
+    size_mb = size / (1024 * 1024)
+    return f"{size_mb:.1f}MB" if size_mb >= 1 else f"{size // 1024}KB"
+
+
+def is_url(text):
+    """Check if text looks like a URL."""
+    try:
+        result = urlparse(text)
+        return all([result.scheme, result.netloc])
+    except Exception:
+        return False
+
+
+def make_snippet(
+    content_type,
+    content,
+    file_path=None,
+    file_size=None,
+    image_width=None,
+    image_height=None,
+):
+    """Build the one-line list text and flags for an item."""
+    flags = 0
+    if content_type == "file":
+        display_name = os.path.basename(file_path) if file_path else "File"
+        snippet = f"📁 {display_name}"
+        if file_size:
+            snippet += f" ({format_size(file_size)})"
+    elif content_type == "image":
+        snippet = "🖼️ Image"
+        if image_width and image_height:
+            snippet += f" ({image_width}x{image_height})"
+        if file_size:
+            snippet += f" ({format_size(file_size)})"
+    else:
+        content = content or ""
+        snippet = (
+            content[:SNIPPET_LENGTH].replace("\n", " ").replace("\r", " ")
+        )
+        if len(content) > SNIPPET_LENGTH:
+            snippet += "..."
+        if is_url(content.strip()):
+            flags |= FLAG_URL
+            snippet = f"🔗 {snippet}"
+    return snippet, flags
+
+
+class ExportCancelled(Exception):
+    """Raised by export_to_json when the caller cancels the export."""
 
 
 class DatabaseManager:
     """Enhanced database manager with file and image support."""
 
-    def __init__(self, db_path="clipboard_history.db"):
+    def __init__(
+        self,
+        db_path="clipboard_history.db",
+        blob_threshold=BLOB_THRESHOLD,
+        compress_threshold=COMPRESS_THRESHOLD,
+        retention=None,
+        query_cache_bytes=QUERY_CACHE_BYTES,
+        **connection_options,
+    ):
         self.db_path = db_path
         self.backup_path = Path(db_path).with_suffix(".json")
+        # Incremental auto-backup; compact it into a snapshot with
+        # `python backup_journal.py compact <journal> <snapshot.json>`
+        self.journal = BackupJournal(Path(db_path).with_suffix(".journal"))
+        # Pragmas (synchronous, cache_size, mmap_size, temp_store, ...) are
+        # passed straight through to the connection manager
+        self.connections = ConnectionManager(db_path, **connection_options)
+        # Large payloads live in content-addressed files next to the DB;
+        # and text above compress_threshold is stored compressed; clip_text()
+        # lets triggers (FTS) and LIKE search see the plain text
+        self.blobs = BlobStore(Path(db_path).with_suffix(".blobs"))
+        self.blob_threshold = int(blob_threshold)
+        self.compressor = TextCompressor(compress_threshold)
+        self.connections.create_function("clip_text", 3, self._clip_text)
+        # Optional retention.RetentionPolicy, enforced by a background job
+        self.retention = retention
+        # Repeated history queries (re-showing the window, toggling a
+        # filter back) are answered from memory until the next write
+        self.query_cache = QueryCache(query_cache_bytes)
+        # Last complete search result, narrowed in memory as the query grows
+        self._search_candidates = None
+        self.fts_enabled = False
+        # Last time the app read or wrote history (not background jobs);
+        # MaintenanceJob waits for a quiet spell before compacting
+        self.last_activity = monotonic()
+        self._jobs = []
         self.init_database()
+        self._load_dictionaries()
+
+    @property
+    def write_generation(self) -> int:
+        """Counter bumped by every committed change to the database."""
+        return self.connections.write_generation
+
+    def start_background_jobs(self, *extra_jobs):
+        """
+        Start background maintenance (e.g. resumable data migrations).
+
+        Callers can pass additional PeriodicJob instances (such as the Qt
+        thumbnail job) so they share the database's lifecycle.
+        """
+        from maintenance import MaintenanceJob
+        from migrations import (
+            BlobMigrationJob,
+            CompressionJob,
+            HashMigrationJob,
+            PayloadMigrationJob,
+            SnippetBackfillJob,
+        )
+        from retention import PurgeJob, RetentionJob
+
+        if not self._jobs:
+            self._jobs = [
+                PayloadMigrationJob(self),
+                SnippetBackfillJob(self),
+                HashMigrationJob(self),
+                BlobMigrationJob(self),
+                CompressionJob(self),
+                BlobGarbageCollectionJob(self),
+                PurgeJob(self),
+                MaintenanceJob(self),
+            ]
+            if self.retention:
+                self._jobs.append(RetentionJob(self, self.retention))
+        self._jobs.extend(extra_jobs)
+        for job in self._jobs:
+            job.start()
+
+    def close(self):
+        """Stop background jobs and close all database connections."""
+        for job in self._jobs:
+            job.stop()
+        self.connections.close()
 
     def init_database(self):
         """Initialize the SQLite database and create tables."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.connections.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT 1 FROM sqlite_master WHERE type = 'table'
+                AND name IN ('clipboard_history', 'clip_meta')
+            """
+            )
+            if cursor.fetchone():
+                cursor.execute("PRAGMA user_version")
+                self._migrate(cursor, cursor.fetchone()[0])
+            self._create_schema(cursor)
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self.fts_enabled = self._ensure_search_index(cursor)
+
+    def _migrate(self, cursor, version):
+        """Bring an existing database up to SCHEMA_VERSION."""
+        if version < 1:
+            # Raw image bytes plus their dimensions; existing base64 rows
+            # are converted in the background by PayloadMigrationJob
+            cursor.execute(
+                "ALTER TABLE clipboard_history ADD COLUMN payload BLOB"
+            )
+            cursor.execute(
+                "ALTER TABLE clipboard_history ADD COLUMN image_width INTEGER"
+            )
+            cursor.execute(
+                "ALTER TABLE clipboard_history ADD COLUMN image_height INTEGER"
+            )
+        if version < 2:
+            # `thumbnail` becomes the list icon; this is the preview size.
+            # Both are filled by ThumbnailJob.
+            cursor.execute(
+                "ALTER TABLE clipboard_history ADD COLUMN preview_thumbnail BLOB"
+            )
+        if version < 3:
+            # Precomputed list text; filled in for old rows by SnippetBackfillJob
+            cursor.execute(
+                "ALTER TABLE clipboard_history ADD COLUMN display_snippet TEXT"
+            )
+            cursor.execute(
+                "ALTER TABLE clipboard_history ADD COLUMN flags INTEGER DEFAULT 0"
+            )
+        if version < 4:
+            # Monotonic ordering key; timestamps only have 1s resolution
+            cursor.execute(
+                "ALTER TABLE clipboard_history ADD COLUMN seq INTEGER"
+            )
+            cursor.execute(
+                """
+                WITH ordered AS (
+                    SELECT id, ROW_NUMBER() OVER (ORDER BY timestamp, id) AS n
+                    FROM clipboard_history
+                )
+                UPDATE clipboard_history
+                SET seq = (SELECT n FROM ordered WHERE ordered.id = clipboard_history.id)
+            """
+            )
+        if version < 5:
+            # content_hash becomes a 16-byte BLAKE2b BLOB. Rows still keyed
+            # by SHA-256 hex are re-keyed in the background by
+            # HashMigrationJob; this index finds them without a table scan
+            # and is dropped once they're all done.
+            cursor.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_legacy_hash
+                ON clipboard_history(id) WHERE typeof(content_hash) = 'text'
+            """
+            )
+        if version < 6:
+            # Hot metadata and cold payload go into separate tables so a
+            # re-copy or favorite toggle doesn't rewrite megabytes of image;
+            # ids are preserved and clipboard_history becomes a view
+            self._split_tables(cursor)
+        if version < 7:
+            # Large payloads move to the blob store (BlobMigrationJob does
+            # existing rows). The view and FTS triggers are recreated to
+            # know about blob_key.
+            if not self._has_column(cursor, "clip_payload", "blob_key"):
+                cursor.execute(
+                    "ALTER TABLE clip_payload ADD COLUMN blob_key TEXT"
+                )
+            self._drop_derived(cursor)
+        if version < 8:
+            # Per-row text compression (CompressionJob does existing rows);
+            # clip_text() gains a codec argument, so the triggers change
+            if not self._has_column(cursor, "clip_payload", "codec"):
+                cursor.execute("ALTER TABLE clip_payload ADD COLUMN codec TEXT")
+            self._drop_derived(cursor)
+        if version < 9:
+            # Stored size per item for byte-based retention; RetentionJob
+            # fills it in for existing rows
+            if not self._has_column(cursor, "clip_meta", "byte_size"):
+                cursor.execute(
+                    "ALTER TABLE clip_meta ADD COLUMN byte_size INTEGER"
+                )
+        if version < 10:
+            # Soft delete: rows are tombstoned and purged in the background
+            if not self._has_column(cursor, "clip_meta", "deleted_by"):
+                cursor.execute(
+                    "ALTER TABLE clip_meta ADD COLUMN deleted_by INTEGER"
+                )
+            self._drop_derived(cursor)
+        if version < 11:
+            # The search index used clip_payload as its content table, where
+            # compressed rows hold codec bytes; it is rebuilt over the
+            # decoding clip_search view by _ensure_search_index
+            cursor.execute("DROP TABLE IF EXISTS clipboard_fts")
+            self._drop_derived(cursor)
+
+    @staticmethod
+    def _drop_derived(cursor):
+        """Drop the views and FTS triggers so they are created again."""
+        cursor.execute("DROP VIEW IF EXISTS clipboard_history")
+        cursor.execute("DROP VIEW IF EXISTS clip_search")
+        for trigger in ("clipboard_fts_ai", "clipboard_fts_ad", "clipboard_fts_au"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+
+    @staticmethod
+    def _has_column(cursor, table, column):
+        cursor.execute(f"PRAGMA table_info({table})")
+        return any(row[1] == column for row in cursor.fetchall())
+
+    def _create_schema(self, cursor):
+        """Create tables, indexes and views if they don't exist yet."""
+        self._create_tables(cursor)
+
+        # Create indexes for better performance
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_timestamp ON clip_meta(timestamp DESC)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_hash ON clip_meta(content_hash)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_favorite ON clip_meta(is_favorite)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_type ON clip_meta(content_type)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_backed_up ON clip_meta(backed_up)"
+        )
+        # Keyset pagination: newest-first walks, optionally within a filter
+        cursor.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_seq ON clip_meta(seq)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_type_seq ON clip_meta(content_type, seq)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_favorite_seq ON clip_meta(is_favorite, seq)"
+        )
+        cursor.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_deleted_by ON clip_meta(deleted_by)
+            WHERE deleted_by IS NOT NULL
+        """
+        )
+
+        # Payload rows live and die with their meta row
+        cursor.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS clip_meta_ad
+            AFTER DELETE ON clip_meta
+            BEGIN
+                DELETE FROM clip_payload WHERE id = old.id;
+            END
+        """
+        )
 
+        # Blob reference counts; BlobGarbageCollectionJob deletes blobs
+        # whose count drops to zero
         cursor.execute(
             """
-            CREATE TABLE IF NOT EXISTS clipboard_history (
+            CREATE TRIGGER IF NOT EXISTS blob_refs_ai
+            AFTER INSERT ON clip_payload
+            WHEN new.blob_key IS NOT NULL
+            BEGIN
+                INSERT INTO blob_refs (blob_key, refs) VALUES (new.blob_key, 1)
+                ON CONFLICT (blob_key) DO UPDATE SET refs = refs + 1;
+            END
+        """
+        )
+        cursor.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS blob_refs_ad
+            AFTER DELETE ON clip_payload
+            WHEN old.blob_key IS NOT NULL
+            BEGIN
+                UPDATE blob_refs SET refs = refs - 1 WHERE blob_key = old.blob_key;
+            END
+        """
+        )
+        cursor.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS blob_refs_au
+            AFTER UPDATE OF blob_key ON clip_payload
+            WHEN old.blob_key IS NOT new.blob_key
+            BEGIN
+                UPDATE blob_refs SET refs = refs - 1 WHERE blob_key = old.blob_key;
+                INSERT INTO blob_refs (blob_key, refs)
+                SELECT new.blob_key, 1 WHERE new.blob_key IS NOT NULL
+                ON CONFLICT (blob_key) DO UPDATE SET refs = refs + 1;
+            END
+        """
+        )
+
+        # Read-only, full-width view of an item (ITEM_COLUMNS come from here)
+        cursor.execute(
+            """
+            CREATE VIEW IF NOT EXISTS clipboard_history AS
+            SELECT m.id, p.content, m.content_hash, m.content_type,
+                   p.file_path, m.file_size, m.mime_type, p.thumbnail,
+                   m.timestamp, m.is_favorite, m.access_count, m.backed_up,
+                   p.payload, m.image_width, m.image_height,
+                   p.preview_thumbnail, m.display_snippet, m.flags, m.seq,
+                   p.blob_key, p.codec, m.deleted_by
+            FROM clip_meta AS m LEFT JOIN clip_payload AS p ON p.id = m.id
+        """
+        )
+
+    def _create_tables(self, cursor):
+        """
+        Create the item tables.
+
+        clip_meta holds the small, hot columns that change on re-copy,
+        favorite and backup; clip_payload holds the large data that is
+        written once. Updating meta never rewrites a multi-MB payload.
+        """
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS clip_meta (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                content TEXT NOT NULL,
-                content_hash TEXT UNIQUE,
+                content_hash BLOB UNIQUE,
                 content_type TEXT DEFAULT 'text',
-                file_path TEXT,
                 file_size INTEGER,
                 mime_type TEXT,
-                thumbnail BLOB,
                 timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
                 is_favorite INTEGER DEFAULT 0,
                 access_count INTEGER DEFAULT 0,
-                backed_up INTEGER DEFAULT 0
+                backed_up INTEGER DEFAULT 0,
+                image_width INTEGER,
+                image_height INTEGER,
+                display_snippet TEXT,
+                flags INTEGER DEFAULT 0,
+                seq INTEGER,
+                byte_size INTEGER,
+                deleted_by INTEGER
+            )
+        """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS clip_payload (
+                id INTEGER PRIMARY KEY,
+                content TEXT NOT NULL,
+                file_path TEXT,
+                thumbnail BLOB,
+                preview_thumbnail BLOB,
+                payload BLOB,
+                blob_key TEXT,
+                codec TEXT
+            )
+        """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS blob_refs (
+                blob_key TEXT PRIMARY KEY,
+                refs INTEGER NOT NULL
+            )
+        """
+        )
+        # Pending deletes: one row per delete_item() (rows point at it via
+        # clip_meta.deleted_by) or clear_history() (hides every row up to
+        # max_seq). PurgeJob removes the rows once the undo window is over.
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS deletions (
+                id INTEGER PRIMARY KEY,
+                created DATETIME DEFAULT CURRENT_TIMESTAMP,
+                max_seq INTEGER,
+                keep_favorites INTEGER DEFAULT 1
+            )
+        """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS compression_dicts (
+                id INTEGER PRIMARY KEY,
+                data BLOB NOT NULL,
+                created DATETIME DEFAULT CURRENT_TIMESTAMP
             )
         """
         )
 
-        # Create indexes for better performance
+    def _split_tables(self, cursor):
+        """Move the single clipboard_history table into clip_meta/clip_payload."""
+        self._create_tables(cursor)
         cursor.execute(
-            "CREATE INDEX IF NOT EXISTS idx_timestamp ON clipboard_history(timestamp DESC)"
+            """
+            INSERT INTO clip_meta (id, content_hash, content_type, file_size,
+                                   mime_type, timestamp, is_favorite,
+                                   access_count, backed_up, image_width,
+                                   image_height, display_snippet, flags, seq)
+            SELECT id, content_hash, content_type, file_size, mime_type,
+                   timestamp, is_favorite, access_count, backed_up,
+                   image_width, image_height, display_snippet, flags, seq
+            FROM clipboard_history
+        """
         )
         cursor.execute(
-            "CREATE INDEX IF NOT EXISTS idx_hash ON clipboard_history(content_hash)"
+            """
+            INSERT INTO clip_payload (id, content, file_path, thumbnail,
+                                      preview_thumbnail, payload)
+            SELECT id, content, file_path, thumbnail, preview_thumbnail, payload
+            FROM clipboard_history
+        """
+        )
+
+        # Keep AUTOINCREMENT from reusing ids of rows deleted before the split
+        cursor.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'clipboard_history'"
+        )
+        row = cursor.fetchone()
+        if row is not None:
+            cursor.execute("DELETE FROM sqlite_sequence WHERE name = 'clip_meta'")
+            cursor.execute(
+                """
+                INSERT INTO sqlite_sequence (name, seq)
+                VALUES ('clip_meta', MAX(?, (SELECT COALESCE(MAX(id), 0) FROM clip_meta)))
+            """,
+                (row[0],),
+            )
+
+        # The search index is rebuilt over clip_payload by _ensure_search_index
+        cursor.execute("DROP TABLE IF EXISTS clipboard_fts")
+        cursor.execute("DROP TABLE clipboard_history")
+        cursor.execute(
+            "DELETE FROM sqlite_sequence WHERE name = 'clipboard_history'"
+        )
+        cursor.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_legacy_hash
+            ON clip_meta(id) WHERE typeof(content_hash) = 'text'
+        """
+        )
+
+    def _ensure_search_index(self, cursor):
+        """
+        Create the FTS5 trigram index over text/file rows if it's missing.
+
+        The index is external-content (it stores no copy of the text) over
+        the clip_search view, which decodes compressed or blob-stored text
+        through clip_text(), so FTS5 never sees codec bytes when it reads
+        rows back (delete, rebuild, integrity-check). Triggers keep it in
+        sync. Returns False when this SQLite build has no FTS5/trigram
+        support, in which case search falls back to LIKE.
+        """
+        types = ", ".join(f"'{t}'" for t in INDEXED_TYPES)
+        cursor.execute(
+            f"""
+            CREATE VIEW IF NOT EXISTS clip_search AS
+            SELECT p.id, clip_text(p.content, p.blob_key, p.codec) AS content,
+                   p.file_path
+            FROM clip_payload AS p JOIN clip_meta AS m ON m.id = p.id
+            WHERE m.content_type IN ({types})
+        """
+        )
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'clipboard_fts'"
         )
+        exists = cursor.fetchone() is not None
+        if not exists:
+            try:
+                cursor.execute(
+                    """
+                    CREATE VIRTUAL TABLE clipboard_fts USING fts5(
+                        content, file_path,
+                        content='clip_search', content_rowid='id',
+                        tokenize='trigram'
+                    )
+                """
+                )
+            except sqlite3.OperationalError as e:
+                print(f"Full-text search unavailable, using LIKE: {e}")
+                return False
+
+        # The type lives in clip_meta, which is always written first
+        indexed = f"(SELECT content_type FROM clip_meta WHERE id = new.id) IN ({types})"
         cursor.execute(
-            "CREATE INDEX IF NOT EXISTS idx_favorite ON clipboard_history(is_favorite)"
+            f"""
+            CREATE TRIGGER IF NOT EXISTS clipboard_fts_ai
+            AFTER INSERT ON clip_payload
+            WHEN {indexed}
+            BEGIN
+                INSERT INTO clipboard_fts(rowid, content, file_path)
+                VALUES (new.id, clip_text(new.content, new.blob_key, new.codec),
+                        new.file_path);
+            END
+        """
         )
+        # Runs before clip_meta_ad removes the payload row it reads from
         cursor.execute(
-            "CREATE INDEX IF NOT EXISTS idx_type ON clipboard_history(content_type)"
+            f"""
+            CREATE TRIGGER IF NOT EXISTS clipboard_fts_ad
+            BEFORE DELETE ON clip_meta
+            WHEN old.content_type IN ({types})
+            BEGIN
+                INSERT INTO clipboard_fts(clipboard_fts, rowid, content, file_path)
+                SELECT 'delete', id, clip_text(content, blob_key, codec),
+                       file_path
+                FROM clip_payload WHERE id = old.id;
+            END
+        """
         )
         cursor.execute(
-            "CREATE INDEX IF NOT EXISTS idx_backed_up ON clipboard_history(backed_up)"
+            f"""
+            CREATE TRIGGER IF NOT EXISTS clipboard_fts_au
+            AFTER UPDATE OF content, file_path ON clip_payload
+            WHEN {indexed}
+            BEGIN
+                INSERT INTO clipboard_fts(clipboard_fts, rowid, content, file_path)
+                VALUES ('delete', old.id,
+                        clip_text(old.content, old.blob_key, old.codec),
+                        old.file_path);
+                INSERT INTO clipboard_fts(rowid, content, file_path)
+                VALUES (new.id, clip_text(new.content, new.blob_key, new.codec),
+                        new.file_path);
+            END
+        """
         )
 
-        conn.commit()
-        conn.close()
+        if not exists:
+            # Index existing rows (clip_search only has text and file rows)
+            cursor.execute(
+                "INSERT INTO clipboard_fts(clipboard_fts) VALUES ('rebuild')"
+            )
+        return True
+
+    def _load_dictionaries(self):
+        """Hand every stored zstd dictionary to the compressor."""
+        rows = (
+            self.connections.reader()
+            .execute("SELECT id, data FROM compression_dicts ORDER BY id")
+            .fetchall()
+        )
+        for dict_id, data in rows:
+            self.compressor.add_dictionary(dict_id, data)
+
+    def add_compression_dictionary(self, data):
+        """Store a trained zstd dictionary and compress new text with it."""
+        with self.connections.writer() as conn:
+            cursor = conn.execute(
+                "INSERT INTO compression_dicts (data) VALUES (?)", (data,)
+            )
+            dict_id = cursor.lastrowid
+        self.compressor.add_dictionary(dict_id, data)
+        return dict_id
+
+    def _clip_text(self, content, blob_key, codec):
+        """SQL clip_text(): a row's plain text, wherever and however stored."""
+        if blob_key is not None:
+            with self.blobs.view(blob_key) as data:
+                if data is None:
+                    return ""
+                return self.compressor.decompress(codec, data)
+        if codec is None:
+            return content
+        return self.compressor.decompress(codec, content)
+
+    def _load_payloads(self, items):
+        """Fill in content/payload of ITEM_COLUMNS rows (blobs, compression)."""
+        resolved = []
+        for item in items:
+            blob_key, codec = item[15], item[16]
+            if blob_key is not None or codec is not None:
+                item = list(item)
+                if item[2] == "image":
+                    item[10] = self.blobs.get(blob_key) or b""
+                else:
+                    item[1] = self._clip_text(item[1], blob_key, codec)
+                item = tuple(item)
+            resolved.append(item)
+        return resolved
+
+    def _externalize(self, content, payload):
+        """
+        Compress text and move oversized payloads (or text) to the blob store.
+
+        Returns (content, payload, blob_key, codec) as they should be stored.
+        """
+        if payload is not None:
+            if len(payload) > self.blob_threshold:
+                return content, None, self.blobs.put(payload), None
+            return content, payload, None, None
+        if not isinstance(content, str):
+            return content, payload, None, None
+
+        codec, data = self.compressor.compress(content)
+        if codec is None and len(content) * 4 <= self.blob_threshold:
+            return content, payload, None, None
+        encoded = data if codec else content.encode("utf-8")
+        if len(encoded) > self.blob_threshold:
+            return "", None, self.blobs.put(encoded), codec
+        return data, None, None, codec
+
+    def _stored_size(self, content, payload, blob_key, thumbnail):
+        """Bytes an item takes up on disk, as counted by retention."""
+        if isinstance(content, str):
+            size = len(content.encode("utf-8"))
+        else:
+            size = len(content or b"")
+        size += len(payload or b"") + len(thumbnail or b"")
+        if blob_key is not None:
+            size += self.blobs.size(blob_key)
+        return size
 
     def add_clipboard_item(
         self,
@@ -66,61 +757,156 @@ class DatabaseManager:
         file_size=None,
         mime_type=None,
         thumbnail=None,
+        payload=None,
+        image_width=None,
+        image_height=None,
+        content_hash=None,
     ):
-        """Add a new clipboard item to the database."""
-        if content_type == "text" and not content.strip():
+        """
+        Add a new clipboard item to the database.
+
+        Pass the content_hash computed at capture to avoid hashing again.
+        """
+        self.last_activity = monotonic()
+        try:
+            with self.connections.writer() as conn:
+                item_id, _ = self._add_item(
+                    conn.cursor(),
+                    content,
+                    content_type,
+                    file_path,
+                    file_size,
+                    mime_type,
+                    thumbnail,
+                    payload,
+                    image_width,
+                    image_height,
+                    content_hash,
+                )
+            return item_id is not None
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
             return False
 
-        # Create hash to avoid duplicates
-        content_hash = hashlib.sha256(str(content).encode()).hexdigest()
+    def _add_item(
+        self,
+        cursor,
+        content,
+        content_type="text",
+        file_path=None,
+        file_size=None,
+        mime_type=None,
+        thumbnail=None,
+        payload=None,
+        image_width=None,
+        image_height=None,
+        content_hash=None,
+    ):
+        """
+        Insert or bump an item inside the caller's transaction.
+
+        Returns (item_id, bumped); item_id is None for blank text.
+        """
+        if content_type == "text" and not content.strip():
+            return None, False
 
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        # Dedupe key; normally computed once at capture and passed in
+        if content_hash is None:
+            content_hash = item_fingerprint(content, payload)
 
-        try:
-            # Check if item already exists
+        # Check if item already exists
+        cursor.execute(
+            "SELECT id FROM clip_meta WHERE content_hash = ?",
+            (content_hash,),
+        )
+        existing = cursor.fetchone()
+
+        if existing:
+            # Update timestamp and access count, and move it to the top.
+            # Only the narrow meta row is rewritten, never the payload.
             cursor.execute(
-                "SELECT id FROM clipboard_history WHERE content_hash = ?",
-                (content_hash,),
+                f"""
+                UPDATE clip_meta
+                SET timestamp = CURRENT_TIMESTAMP, access_count = access_count + 1,
+                    seq = {NEXT_SEQ}, deleted_by = NULL
+                WHERE id = ?
+            """,
+                (existing[0],),
             )
-            existing = cursor.fetchone()
+            return existing[0], True
 
-            if existing:
-                # Update timestamp and access count for existing item
-                cursor.execute(
-                    """
-                    UPDATE clipboard_history
-                    SET timestamp = CURRENT_TIMESTAMP, access_count = access_count + 1
-                    WHERE id = ?
-                """,
-                    (existing[0],),
-                )
-            else:
-                # Insert new item
-                cursor.execute(
-                    """
-                    INSERT INTO clipboard_history (content, content_hash, content_type,
-                                                 file_path, file_size, mime_type, thumbnail)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                    (
-                        content,
-                        content_hash,
-                        content_type,
-                        file_path,
-                        file_size,
-                        mime_type,
-                        thumbnail,
-                    ),
-                )
+        # Insert new item
+        snippet, flags = make_snippet(
+            content_type, content, file_path, file_size, image_width, image_height
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO clip_meta (content_hash, content_type, file_size,
+                                   mime_type, image_width, image_height,
+                                   display_snippet, flags, seq)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, {NEXT_SEQ})
+        """,
+            (
+                content_hash,
+                content_type,
+                file_size,
+                mime_type,
+                image_width,
+                image_height,
+                snippet,
+                flags,
+            ),
+        )
+        item_id = cursor.lastrowid
+        content, payload, blob_key, codec = self._externalize(content, payload)
+        cursor.execute(
+            """
+            INSERT INTO clip_payload (id, content, file_path, thumbnail,
+                                      payload, blob_key, codec)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+            (item_id, content, file_path, thumbnail, payload, blob_key, codec),
+        )
+        cursor.execute(
+            "UPDATE clip_meta SET byte_size = ? WHERE id = ?",
+            (self._stored_size(content, payload, blob_key, thumbnail), item_id),
+        )
+        return item_id, False
 
-            conn.commit()
-            return True
-        except sqlite3.Error as e:
-            print(f"Database error: {e}")
-            return False
-        finally:
-            conn.close()
+    def apply_batch(self, operations):
+        """
+        Apply queued mutations in a single transaction.
+
+        `operations` is a list of (op, kwargs) tuples where op is "add",
+        "favorite", "delete", "clear" or "undo" (see undo_delete). Returns a
+        list of (op, item_id) for every operation that took effect, in order;
+        an "add" of an item already in history is reported as "bump", and a
+        "clear" or "undo" reports its tombstone id instead of an item id.
+        """
+        self.last_activity = monotonic()
+        results = []
+        with self.connections.writer() as conn:
+            cursor = conn.cursor()
+            for op, kwargs in operations:
+                if op == "add":
+                    item_id, bumped = self._add_item(cursor, **kwargs)
+                    if bumped:
+                        op = "bump"
+                elif op == "favorite":
+                    item_id = kwargs["item_id"]
+                    self._toggle_favorite(cursor, item_id)
+                elif op == "delete":
+                    item_id = kwargs["item_id"]
+                    self._soft_delete_item(cursor, item_id)
+                elif op == "clear":
+                    item_id = self._clear_history(cursor, **kwargs)
+                elif op == "undo":
+                    item_id = self._undo_delete(cursor)
+                else:
+                    raise ValueError(f"Unknown batch operation: {op}")
+                if item_id is not None:
+                    results.append((op, item_id))
+        return results
 
     def get_clipboard_history(
         self,
@@ -129,21 +915,312 @@ class DatabaseManager:
         favorites_only=False,
         content_type_filter="all",
     ):
-        """Retrieve clipboard history with optional filtering."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """
+        Retrieve clipboard history with optional filtering.
 
-        query = """
-            SELECT id, content, content_type, file_path, file_size, mime_type,
-                   thumbnail, timestamp, is_favorite, access_count
-            FROM clipboard_history
+        With a search term, results are ranked by bm25 relevance (newest
+        first among equals); otherwise they are ordered newest first.
+        Use page() to walk past the first `limit` rows.
         """
+        return self._load_payloads(
+            self._query_history(
+                ITEM_COLUMNS,
+                "clipboard_history",
+                limit,
+                search_term,
+                favorites_only,
+                content_type_filter,
+            )
+        )
+
+    def get_clipboard_history_summaries(
+        self,
+        limit=100,
+        search_term="",
+        favorites_only=False,
+        content_type_filter="all",
+    ):
+        """
+        Like get_clipboard_history, but only the fields needed for a list row.
+
+        Returns (id, content_type, display_snippet, flags, display_time,
+        is_favorite, access_count, seq) tuples; use get_item() for the rest.
+        """
+        return self._query_history(
+            SUMMARY_COLUMNS,
+            "clip_meta",
+            limit,
+            search_term,
+            favorites_only,
+            content_type_filter,
+        )
+
+    def page(self, after_seq=None, page_size=100, filters=None):
+        """
+        Keyset-paginate history summaries, newest first.
+
+        Pass the `seq` of the last row of the previous page (summary[7]) as
+        `after_seq` to get the next one. `filters` may contain search_term,
+        favorites_only and content_type_filter. Unlike OFFSET, every page
+        costs the same no matter how deep it is. Search results are ordered
+        by recency here, not relevance, so the cursor stays stable.
+        """
+        generation = self.write_generation
+        rows = self._page_from_memory(after_seq, page_size, filters, generation)
+        if rows is None:
+            query = self._page_query(after_seq, page_size, filters)
+            rows = self._history_cursor(*query).fetchall()
+            self.query_cache.put(query, generation, rows)
+            self._keep_candidates(after_seq, page_size, filters, generation, rows)
+        return list(rows)
+
+    def cached_page(self, after_seq=None, page_size=100, filters=None):
+        """page() from memory, or None if it would hit the database."""
+        return self._page_from_memory(
+            after_seq, page_size, filters, self.write_generation
+        )
+
+    def stream_page(
+        self, after_seq=None, page_size=100, filters=None, chunk_size=50
+    ):
+        """
+        Like page(), but yield the rows in lists of up to `chunk_size` as
+        SQLite finds them, so a slow search shows its first matches early.
+        Meant for a worker thread (see SearchWorker), which can abort the
+        query between chunks or from its connection's progress handler.
+        """
+        generation = self.write_generation
+        rows = self._page_from_memory(after_seq, page_size, filters, generation)
+        if rows is not None:
+            for start in range(0, len(rows), chunk_size):
+                yield rows[start : start + chunk_size]
+            return
+
+        query = self._page_query(after_seq, page_size, filters)
+        cursor = self._history_cursor(*query)
+        found = []
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            found.extend(rows)
+            yield rows
+        # Only reached when the whole page was read
+        self.query_cache.put(query, generation, found)
+        self._keep_candidates(after_seq, page_size, filters, generation, found)
+
+    def _page_from_memory(self, after_seq, page_size, filters, generation):
+        """
+        A page from the query cache or, for a search that extends the last
+        complete one ("foo" -> "foob"), by narrowing that one's rows in
+        memory (see search_refine). None if SQLite has to be asked.
+        """
+        rows = self.query_cache.get(
+            self._page_query(after_seq, page_size, filters), generation
+        )
+        if rows is not None:
+            return rows
+
+        filters = filters or {}
+        search_term = filters.get("search_term", "")
+        candidates = self._search_candidates
+        if (
+            candidates is None
+            or after_seq is not None
+            or not self._refinable(search_term)
+        ):
+            return None
+        # Always narrowed from the search that was actually run, so any
+        # refinement of it works ("foo" -> "foob" -> "foo bar")
+        rows = candidates.refine(
+            self._search_scope(page_size, filters), search_term, generation
+        )
+        if rows is not None:
+            self.query_cache.put(
+                self._page_query(after_seq, page_size, filters), generation, rows
+            )
+        return rows
+
+    def _keep_candidates(self, after_seq, page_size, filters, generation, rows):
+        """Keep a search's complete first page, with its text, for refining."""
+        filters = filters or {}
+        search_term = filters.get("search_term", "")
+        if (
+            after_seq is not None
+            or not self._refinable(search_term)
+            or len(rows) >= page_size
+        ):
+            return  # nothing to refine, or more matches than were read
+        texts = {}
+        if rows:
+            item_ids = [row[0] for row in rows]
+            placeholders = ", ".join("?" for _ in item_ids)
+            cursor = self.connections.reader().execute(
+                f"""
+                SELECT id, clip_text(content, blob_key, codec), file_path
+                FROM clip_payload WHERE id IN ({placeholders})
+            """,
+                item_ids,
+            )
+            texts = {
+                item_id: (content, file_path)
+                for item_id, content, file_path in cursor
+            }
+        self._search_candidates = SearchCandidates.from_search(
+            self._search_scope(page_size, filters),
+            search_term,
+            rows,
+            texts,
+            generation,
+        )
+
+    def _refinable(self, search_term):
+        """
+        True if every term of a search goes through the FTS5 index.
+
+        Refining matches with Unicode case folding, as FTS5 does; the LIKE
+        fallback for short terms only folds ASCII, so those searches are
+        never kept or narrowed in memory.
+        """
+        terms = parse_search_terms(search_term)
+        return bool(terms) and self.fts_enabled and not split_terms(terms)[1]
+
+    @staticmethod
+    def _search_scope(page_size, filters):
+        """Everything about a page() call except the search term."""
+        return (
+            page_size,
+            filters.get("favorites_only", False),
+            filters.get("content_type_filter", "all"),
+        )
+
+    @staticmethod
+    def _page_query(after_seq, page_size, filters):
+        """_query_history() arguments for a page() call."""
+        filters = filters or {}
+        return (
+            SUMMARY_COLUMNS,
+            "clip_meta",
+            page_size,
+            filters.get("search_term", ""),
+            filters.get("favorites_only", False),
+            filters.get("content_type_filter", "all"),
+            after_seq,
+            False,
+        )
+
+    def get_summaries(self, item_ids, filters=None):
+        """
+        Summaries (as in page()) of the given items, in no particular order.
+
+        Items hidden by a delete, or not matching `filters` (as in page()),
+        are left out. Only the given rows are looked at, so this stays cheap
+        during a search that matches much of the history.
+        """
+        if not item_ids:
+            return []
+        filters = filters or {}
+        return self._query_history(
+            SUMMARY_COLUMNS,
+            "clip_meta",
+            0,
+            filters.get("search_term", ""),
+            filters.get("favorites_only", False),
+            filters.get("content_type_filter", "all"),
+            item_ids=item_ids,
+            ranked=False,
+        )
+
+    def get_item(self, item_id):
+        """Load one full history item, or None if it no longer exists."""
+        self.last_activity = monotonic()
+        cursor = self.connections.reader().cursor()
+        cursor.execute(
+            f"SELECT {ITEM_COLUMNS} FROM clipboard_history WHERE id = ?",
+            (item_id,),
+        )
+        item = cursor.fetchone()
+        return self._load_payloads([item])[0] if item else None
+
+    def _query_history(
+        self,
+        columns,
+        source,
+        limit,
+        search_term,
+        favorites_only,
+        content_type_filter,
+        after_seq=None,
+        ranked=True,
+        item_ids=None,
+    ):
+        query = (
+            columns,
+            source,
+            limit,
+            search_term,
+            favorites_only,
+            content_type_filter,
+            after_seq,
+            ranked,
+        )
+        if item_ids is not None:
+            # Looked up right after writes; not worth caching
+            return self._history_cursor(*query, item_ids).fetchall()
+
+        # The generation is read first, so rows can't be cached as newer
+        # than they are if a write commits while the query runs
+        generation = self.write_generation
+        rows = self.query_cache.get(query, generation)
+        if rows is None:
+            rows = self._history_cursor(*query).fetchall()
+            self.query_cache.put(query, generation, rows)
+        return list(rows)
+
+    def _history_cursor(
+        self,
+        columns,
+        source,
+        limit,
+        search_term,
+        favorites_only,
+        content_type_filter,
+        after_seq=None,
+        ranked=True,
+        item_ids=None,
+    ):
+        """Run a history query on this thread's reader; return the cursor."""
+        self.last_activity = monotonic()
+        cursor = self.connections.reader().cursor()
+
+        query = f"SELECT {columns} FROM {source} AS h"
         params = []
-        conditions = []
+        conditions = [VISIBLE]
+        full_clear, any_clear = self._clear_bounds(cursor)
+        # Down to the newest keep-favorites clear only favorites are left
+        split_clear = any_clear > full_clear and not favorites_only
+        # Sorting the result instead of walking idx_seq in order lets the
+        # planner read those two ranges rather than every row the clear hid
+        order_by = "+seq DESC" if split_clear else "seq DESC"
 
         if search_term:
-            conditions.append("(content LIKE ? OR file_path LIKE ?)")
-            params.extend([f"%{search_term}%", f"%{search_term}%"])
+            join, search_params, search_conditions, like_params = (
+                self._search_filter(search_term, ranked, item_ids)
+            )
+            if join:
+                query += join
+                if ranked:
+                    order_by = "fts.rank, " + order_by
+            params.extend(search_params)
+            conditions.extend(search_conditions)
+            params.extend(like_params)
+
+        if split_clear:
+            conditions.append("(h.seq > ? OR (h.is_favorite = 1 AND h.seq > ?))")
+            params.extend([any_clear, full_clear])
+        elif full_clear:
+            conditions.append("h.seq > ?")
+            params.append(full_clear)
 
         if favorites_only:
             conditions.append("is_favorite = 1")
@@ -152,190 +1229,331 @@ class DatabaseManager:
             conditions.append("content_type = ?")
             params.append(content_type_filter)
 
+        if after_seq is not None:
+            conditions.append("seq < ?")
+            params.append(after_seq)
+
+        if item_ids is not None:
+            placeholders = ", ".join("?" for _ in item_ids)
+            conditions.append(f"h.id IN ({placeholders})")
+            params.extend(item_ids)
+
         if conditions:
             query += " WHERE " + " AND ".join(conditions)
 
-        query += " ORDER BY timestamp DESC"
+        query += f" ORDER BY {order_by}"
 
         if limit > 0:
             query += " LIMIT ?"
             params.append(limit)
 
         cursor.execute(query, params)
-        results = cursor.fetchall()
-        conn.close()
+        return cursor
 
-        return results
+    @staticmethod
+    def _clear_bounds(cursor):
+        """
+        (full, any): the highest seq hidden by a pending clear of everything,
+        and by any pending clear (favorites are kept up to `any`); 0 if none.
+        """
+        return cursor.execute(
+            """
+            SELECT COALESCE(MAX(max_seq) FILTER (WHERE keep_favorites = 0), 0),
+                   COALESCE(MAX(max_seq), 0)
+            FROM deletions
+        """
+        ).fetchone()
+
+    def _search_filter(self, search_term, ranked=True, item_ids=None):
+        """
+        Translate a search string into (join, join_params, conditions, params).
+
+        Terms long enough for the trigram index go through FTS5 MATCH (when
+        `ranked`, the join also exposes `fts.rank`, the bm25 score); shorter
+        ones, or all of them without FTS5, fall back to LIKE. Image rows are
+        never matched. With `item_ids`, only those rows are looked up in the
+        index instead of every match.
+        """
+        terms = parse_search_terms(search_term)
+        if not terms:
+            return "", [], [], []
+
+        if self.fts_enabled:
+            indexed, short = split_terms(terms)
+        else:
+            indexed, short = [], terms
+
+        join = ""
+        join_params = []
+        conditions = []
+        params = []
+        if indexed:
+            # Scoring every match is wasted work when results go by seq
+            rank = ", bm25(clipboard_fts) AS rank" if ranked else ""
+            only = ""
+            join_params.append(fts_match_expression(indexed))
+            if item_ids is not None:
+                only = f" AND rowid IN ({', '.join('?' for _ in item_ids)})"
+                join_params.extend(item_ids)
+            join = f"""
+                JOIN (
+                    SELECT rowid AS fts_id{rank}
+                    FROM clipboard_fts WHERE clipboard_fts MATCH ?{only}
+                ) AS fts ON fts.fts_id = h.id
+            """
+        else:
+            types = ", ".join("?" for _ in INDEXED_TYPES)
+            conditions.append(f"content_type IN ({types})")
+            params.extend(INDEXED_TYPES)
+
+        for term in short:
+            conditions.append(
+                """EXISTS (
+                    SELECT 1 FROM clip_payload AS p WHERE p.id = h.id
+                    AND (clip_text(p.content, p.blob_key, p.codec) LIKE ? ESCAPE '\\'
+                         OR p.file_path LIKE ? ESCAPE '\\')
+                )"""
+            )
+            params.extend([like_pattern(term), like_pattern(term)])
+
+        return join, join_params, conditions, params
 
     def delete_item(self, item_id):
-        """Delete a specific clipboard item."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """
+        Delete a specific clipboard item.
+
+        The row is only hidden; it can be brought back with undo_delete()
+        for UNDO_WINDOW seconds, after which PurgeJob removes it.
+        """
+        self.last_activity = monotonic()
+        with self.connections.writer() as conn:
+            self._soft_delete_item(conn.cursor(), item_id)
+
+    def _soft_delete_item(self, cursor, item_id):
+        cursor.execute("INSERT INTO deletions DEFAULT VALUES")
+        cursor.execute(
+            "UPDATE clip_meta SET deleted_by = ? WHERE id = ?",
+            (cursor.lastrowid, item_id),
+        )
+
+    def _delete_item(self, cursor, item_id):
+        """Remove an item for good (clip_meta_ad removes its payload too)."""
+        cursor.execute("DELETE FROM clip_meta WHERE id = ?", (item_id,))
+
+    def undo_delete(self):
+        """
+        Restore the most recent delete or clear still inside the undo window.
+
+        Returns True if something was restored.
+        """
+        self.last_activity = monotonic()
+        with self.connections.writer() as conn:
+            return self._undo_delete(conn.cursor()) is not None
+
+    def _undo_delete(self, cursor):
+        cursor.execute(
+            """
+            SELECT id FROM deletions WHERE created > datetime('now', ?)
+            ORDER BY id DESC LIMIT 1
+        """,
+            (f"-{UNDO_WINDOW} seconds",),
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
         cursor.execute(
-            "DELETE FROM clipboard_history WHERE id = ?", (item_id,)
+            "UPDATE clip_meta SET deleted_by = NULL WHERE deleted_by = ?", row
         )
-        conn.commit()
-        conn.close()
+        cursor.execute("DELETE FROM deletions WHERE id = ?", row)
+        return row[0]
 
     def toggle_favorite(self, item_id):
         """Toggle favorite status of an item."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        self.last_activity = monotonic()
+        with self.connections.writer() as conn:
+            self._toggle_favorite(conn.cursor(), item_id)
+
+    def _toggle_favorite(self, cursor, item_id):
         cursor.execute(
             """
-            UPDATE clipboard_history
+            UPDATE clip_meta
             SET is_favorite = CASE WHEN is_favorite = 0 THEN 1 ELSE 0 END
             WHERE id = ?
         """,
             (item_id,),
         )
-        conn.commit()
-        conn.close()
 
     def clear_history(self, keep_favorites=True):
-        """Clear clipboard history, optionally keeping favorites."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        if keep_favorites:
-            cursor.execute(
-                "DELETE FROM clipboard_history WHERE is_favorite = 0"
-            )
-        else:
-            cursor.execute("DELETE FROM clipboard_history")
+        """
+        Clear clipboard history, optionally keeping favorites.
 
-        conn.commit()
-        conn.close()
+        Constant time whatever the history size: a single tombstone hides
+        every current row, and PurgeJob deletes them in small chunks once
+        the undo window (see undo_delete) is over.
+        """
+        self.last_activity = monotonic()
+        with self.connections.writer() as conn:
+            self._clear_history(conn.cursor(), keep_favorites)
 
-    def export_to_json(self, file_path, favorites_only=False):
-        """Export clipboard history to JSON."""
-        items = self.get_clipboard_history(
-            limit=0, favorites_only=favorites_only
+    def _clear_history(self, cursor, keep_favorites=True):
+        """Add the clear's tombstone; return its id, or None if empty."""
+        cursor.execute(
+            """
+            INSERT INTO deletions (max_seq, keep_favorites)
+            SELECT MAX(seq), ? FROM clip_meta HAVING MAX(seq) IS NOT NULL
+        """,
+            (1 if keep_favorites else 0,),
         )
+        return cursor.lastrowid if cursor.rowcount > 0 else None
 
-        export_data = {
-            "export_info": {
-                "timestamp": datetime.now().isoformat(),
-                "total_items": len(items),
-                "favorites_only": favorites_only,
-                "version": "1.0",
-            },
-            "items": [],
+    @staticmethod
+    def _item_to_json(item):
+        """Serialize a history item tuple for JSON export/backup."""
+        content = item[1]
+        if item[2] == "image" and item[10]:
+            # Export format keeps images as base64 in `content`
+            content = base64.b64encode(item[10]).decode("ascii")
+        return {
+            "id": item[0],
+            "content": content,
+            "content_type": item[2],
+            "file_path": item[3],
+            "file_size": item[4],
+            "mime_type": item[5],
+            "thumbnail": (
+                base64.b64encode(item[6]).decode() if item[6] else None
+            ),
+            "timestamp": item[7],
+            "is_favorite": bool(item[8]),
+            "access_count": item[9],
+            "image_width": item[11],
+            "image_height": item[12],
+            "content_hash": (
+                item[14].hex() if isinstance(item[14], bytes) else item[14]
+            ),
         }
 
-        for item in items:
-            item_data = {
-                "id": item[0],
-                "content": item[1],
-                "content_type": item[2],
-                "file_path": item[3],
-                "file_size": item[4],
-                "mime_type": item[5],
-                "thumbnail": (
-                    base64.b64encode(item[6]).decode() if item[6] else None
-                ),
-                "timestamp": item[7],
-                "is_favorite": bool(item[8]),
-                "access_count": item[9],
-            }
-            export_data["items"].append(item_data)
-
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(export_data, f, indent=2, ensure_ascii=False)
+    def iter_export_items(self, favorites_only=False, chunk_size=200):
+        """
+        Stream full items for export, oldest first, in chunks.
 
-        # Mark items as backed up
-        if items:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            item_ids = [str(item[0]) for item in items]
-            cursor.execute(
-                f"""
-                UPDATE clipboard_history
-                SET backed_up = 1
-                WHERE id IN ({",".join(item_ids)})
-            """
+        Yields (total, chunk) pairs. Everything is read inside one read
+        transaction so the export is a consistent snapshot even while the
+        writer keeps committing.
+        """
+        conn = self.connections.reader()
+        where = f"WHERE {VISIBLE}"
+        if favorites_only:
+            where += " AND is_favorite = 1"
+        conn.execute("BEGIN")
+        try:
+            total = conn.execute(
+                f"SELECT COUNT(*) FROM clip_meta AS h {where}"
+            ).fetchone()[0]
+            cursor = conn.execute(
+                f"SELECT {ITEM_COLUMNS} FROM clipboard_history AS h {where} "
+                "ORDER BY seq"
             )
-            conn.commit()
-            conn.close()
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                yield total, self._load_payloads(chunk)
+        finally:
+            conn.execute("COMMIT")
 
-        return len(items)
+    def export_to_json(
+        self,
+        file_path,
+        favorites_only=False,
+        progress_callback=None,
+        is_cancelled=None,
+    ):
+        """
+        Export clipboard history to JSON, streaming rows to disk.
 
-    def backup_unsynced_items(self):
-        """Backup items that haven't been backed up yet."""
+        Memory stays flat regardless of history size. `progress_callback`
+        is called with (done, total) after each chunk; if `is_cancelled`
+        returns True the partial file is discarded and ExportCancelled is
+        raised. Returns the number of exported items.
+        """
+        file_path = Path(file_path)
+        tmp_path = file_path.with_name(file_path.name + ".part")
+        done = 0
+        total = 0
         try:
-            # Get items that haven't been backed up
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                items = self.iter_export_items(favorites_only)
+                for total, chunk in items:
+                    if done == 0:
+                        self._write_export_header(f, total, favorites_only)
+                    for item in chunk:
+                        f.write(",\n    " if done else "\n    ")
+                        json.dump(self._item_to_json(item), f, ensure_ascii=False)
+                        done += 1
+                    if progress_callback is not None:
+                        progress_callback(done, total)
+                    if is_cancelled is not None and is_cancelled():
+                        items.close()
+                        raise ExportCancelled()
+
+                if done == 0:
+                    self._write_export_header(f, 0, favorites_only)
+                f.write("\n  ]\n}\n")
+            os.replace(tmp_path, file_path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+        return done
+
+    @staticmethod
+    def _write_export_header(f, total, favorites_only):
+        export_info = {
+            "timestamp": datetime.now().isoformat(),
+            "total_items": total,
+            "favorites_only": favorites_only,
+            "version": "1.0",
+        }
+        f.write('{\n  "export_info": ')
+        json.dump(export_info, f)
+        f.write(',\n  "items": [')
+
+    def backup_unsynced_items(self, chunk_size=500):
+        """
+        Append items that haven't been backed up yet to the backup journal.
+
+        Only new rows are read and written, oldest first, a chunk at a time;
+        each chunk is marked backed up once the journal has fsynced it.
+        """
+        total = 0
+        try:
+            cursor = self.connections.reader().cursor()
             cursor.execute(
-                """
-                SELECT id, content, content_type, file_path, file_size, mime_type,
-                       thumbnail, timestamp, is_favorite, access_count
+                f"""
+                SELECT {ITEM_COLUMNS}
                 FROM clipboard_history
                 WHERE backed_up = 0
-                ORDER BY timestamp DESC
+                ORDER BY seq
             """
             )
-            unsynced_items = cursor.fetchall()
-            conn.close()
-
-            if not unsynced_items:
-                return 0
-
-            # Load existing backup or create new one
-            backup_data = {"export_info": {}, "items": []}
-            if self.backup_path.exists():
-                try:
-                    with open(self.backup_path, "r", encoding="utf-8") as f:
-                        backup_data = json.load(f)
-                except:
-                    backup_data = {"export_info": {}, "items": []}
-
-            # Add unsynced items to backup
-            for item in unsynced_items:
-                item_data = {
-                    "id": item[0],
-                    "content": item[1],
-                    "content_type": item[2],
-                    "file_path": item[3],
-                    "file_size": item[4],
-                    "mime_type": item[5],
-                    "thumbnail": (
-                        base64.b64encode(item[6]).decode() if item[6] else None
-                    ),
-                    "timestamp": item[7],
-                    "is_favorite": bool(item[8]),
-                    "access_count": item[9],
-                }
-                backup_data["items"].append(item_data)
-
-            # Update export info
-            backup_data["export_info"] = {
-                "timestamp": datetime.now().isoformat(),
-                "total_items": len(backup_data["items"]),
-                "version": "1.0",
-                "auto_backup": True,
-            }
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                if not chunk:
+                    break
 
-            # Save updated backup
-            with open(self.backup_path, "w", encoding="utf-8") as f:
-                json.dump(backup_data, f, indent=2, ensure_ascii=False)
+                chunk = self._load_payloads(chunk)
+                self.journal.append(self._item_to_json(item) for item in chunk)
 
-            # Mark items as backed up
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            item_ids = [str(item[0]) for item in unsynced_items]
-            cursor.execute(
-                f"""
-                UPDATE clipboard_history
-                SET backed_up = 1
-                WHERE id IN ({",".join(item_ids)})
-            """
-            )
-            conn.commit()
-            conn.close()
+                with self.connections.writer() as conn:
+                    conn.executemany(
+                        "UPDATE clip_meta SET backed_up = 1 WHERE id = ?",
+                        [(item[0],) for item in chunk],
+                    )
+                total += len(chunk)
 
-            return len(unsynced_items)
+            return total
 
         except Exception as e:
             print(f"Backup error: {e}")
-            return 0
+            return total
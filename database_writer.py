@@ -0,0 +1,134 @@
+import queue
+import sqlite3
+from time import monotonic
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+
+class DatabaseWriter(QThread):
+    """
+    Dedicated writer thread that group-commits clipboard mutations.
+
+    Callers enqueue inserts, favorite toggles, deletes, clears and undos;
+    the thread drains everything that arrives within one flush window and
+    commits it as a single transaction, so a burst of clipboard events
+    costs one fsync instead of one per event.
+
+    Producers never block. Once `max_pending` operations are waiting, new
+    clipboard captures are dropped; user actions (favorite, delete, clear,
+    undo) are always queued.
+    """
+
+    batch_committed = pyqtSignal(list)  # [(op, item_id), ...]
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        db_manager,
+        max_pending: int = 256,
+        flush_window_ms: int = 50,
+        max_batch: int = 128,
+    ):
+        super().__init__()
+        self.db_manager = db_manager
+        self._queue = queue.Queue()
+        self._max_pending = max_pending
+        self._flush_window = flush_window_ms / 1000
+        self._max_batch = max_batch
+
+    # ---------- Producer API (any thread) ----------
+
+    def add_clipboard_item(self, **fields):
+        """Queue a new clipboard item (same fields as add_clipboard_item)."""
+        self._submit("add", fields)
+
+    def toggle_favorite(self, item_id):
+        self._submit("favorite", {"item_id": item_id})
+
+    def delete_item(self, item_id):
+        self._submit("delete", {"item_id": item_id})
+
+    def clear_history(self, keep_favorites=True):
+        self._submit("clear", {"keep_favorites": keep_favorites})
+
+    def undo_delete(self):
+        """Queue an undo of the latest delete/clear (after pending deletes)."""
+        self._submit("undo", {})
+
+    def _submit(self, op, kwargs):
+        # Never block the caller (usually the GUI thread); if the writer has
+        # fallen this far behind, shed captures rather than freeze. User
+        # actions are rare and must not vanish, so they are always queued.
+        if op == "add" and self._queue.qsize() >= self._max_pending:
+            print("Write queue full, dropping add operation")
+            return
+        self._queue.put((op, kwargs))
+
+    # ---------- Writer loop ----------
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is self._STOP:
+                break
+
+            batch = [first]
+            deadline = monotonic() + self._flush_window
+            while len(batch) < self._max_batch:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    op = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if op is self._STOP:
+                    stopping = True
+                    break
+                batch.append(op)
+
+            results = self._commit(batch)
+            if results:
+                self.batch_committed.emit(results)
+
+        # Drain whatever was queued before stop() so nothing is lost
+        leftovers = []
+        while True:
+            try:
+                op = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if op is not self._STOP:
+                leftovers.append(op)
+        if leftovers:
+            results = self._commit(leftovers)
+            if results:
+                self.batch_committed.emit(results)
+
+    def _commit(self, batch):
+        # Anything escaping here would end the thread and leave the queue
+        # undrained, so every error is logged and the loop carries on
+        try:
+            return self.db_manager.apply_batch(batch)
+        except Exception as e:
+            # One bad operation shouldn't drop the whole batch; retry singly
+            print(f"Batch commit failed, retrying individually: {e}")
+            results = []
+            for op in batch:
+                try:
+                    results.extend(self.db_manager.apply_batch([op]))
+                except sqlite3.Error as e:
+                    print(f"Database error: {e}")
+                except Exception as e:
+                    print(f"Write failed ({op[0]}): {e}")
+            return results
+
+    def stop(self):
+        """Flush pending operations and stop the writer thread."""
+        self._queue.put(self._STOP)
+        try:
+            self.wait(5000)
+        except Exception:
+            pass
@@ -0,0 +1,40 @@
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from database_manager import ExportCancelled
+
+
+class ExportWorker(QThread):
+    """Run DatabaseManager.export_to_json off the GUI thread."""
+
+    progress = pyqtSignal(int, int)  # done, total
+    completed = pyqtSignal(int)  # exported item count
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, db_manager, file_path, favorites_only=False):
+        super().__init__()
+        self.db_manager = db_manager
+        self.file_path = file_path
+        self.favorites_only = favorites_only
+        self._cancel_requested = False
+
+    def cancel(self):
+        """Ask the export to stop after the current chunk."""
+        self._cancel_requested = True
+
+    def run(self):
+        try:
+            count = self.db_manager.export_to_json(
+                self.file_path,
+                self.favorites_only,
+                progress_callback=self.progress.emit,
+                is_cancelled=lambda: self._cancel_requested,
+            )
+        except ExportCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.completed.emit(count)
+        finally:
+            self.db_manager.connections.release_reader()
@@ -0,0 +1,36 @@
+"""
+Canonical content fingerprint.
+
+Every clipboard item is hashed exactly once, at capture, and the digest
+travels with it: dedupe, the database's UNIQUE content_hash column, the
+UI's self-copy suppression and backups all reuse it. Binary items (images)
+are keyed by their raw bytes, everything else by its text.
+"""
+
+import hashlib
+
+# 128 bits is plenty to tell clipboard items apart, and stays a small index key
+HASH_SIZE = 16
+
+# Keys the digest to this app so it never collides with hashes of the same
+# bytes computed for other purposes (e.g. the thumbnail pixel fingerprint)
+HASH_KEY = b"clipboard-history-v1"
+
+
+def fingerprint(content) -> bytes:
+    """BLAKE2b digest of bytes, or of a string's UTF-8 encoding."""
+    if isinstance(content, str):
+        content = content.encode("utf-8", errors="ignore")
+    return hashlib.blake2b(
+        content, digest_size=HASH_SIZE, key=HASH_KEY
+    ).digest()
+
+
+def item_fingerprint(content, payload=None) -> bytes:
+    """Fingerprint of a clipboard item: its payload if it has one."""
+    return fingerprint(payload if payload else str(content))
+
+
+def is_legacy_hash(value) -> bool:
+    """True for a pre-fingerprint SHA-256 hex key."""
+    return isinstance(value, str)
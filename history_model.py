@@ -0,0 +1,291 @@
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, Qt
+
+# Summary tuple field (see DatabaseManager.get_clipboard_history_summaries)
+SUMMARY_SEQ = 7
+
+
+def summary_text(summary):
+    """List text for a history summary."""
+    snippet, display_time, is_favorite = summary[2], summary[4], summary[5]
+    favorite_mark = "★ " if is_favorite else ""
+    return f"{favorite_mark}[{display_time}] {snippet}"
+
+
+class HistoryModel(QAbstractListModel):
+    """
+    Lazily paged list model over the clipboard history.
+
+    Rows are fetched a page at a time with DatabaseManager.page() as the
+    view scrolls (canFetchMore/fetchMore). The model itself only keeps each
+    fetched row's id and seq in compact arrays (plus a set of the ids for
+    membership tests); summary tuples live in an LRU cache of `cache_rows`
+    entries and are re-read by id, a block at a time, when a row that was
+    evicted scrolls back into view. Memory stays flat however far the
+    history is scrolled.
+
+    Writes are applied with apply_changes() as row inserts, moves, updates
+    and removals, so the view keeps its selection and scroll position.
+
+    With a SearchWorker, pages are read on the worker thread instead and
+    their rows appended as they stream in; a page still being read for
+    older filters is abandoned.
+    """
+
+    def __init__(
+        self,
+        db_manager,
+        page_size: int = 200,
+        cache_rows: int = 2000,
+        search_worker=None,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self.db_manager = db_manager
+        self.page_size = page_size
+        self.cache_rows = max(cache_rows, page_size)
+        self.filters = {}
+        self._ids = array("q")
+        self._seqs = array("q")
+        self._loaded_ids = set()
+        self._cache = OrderedDict()  # item id -> summary tuple
+        self._exhausted = True
+        self.search_worker = search_worker
+        self._generation = None  # worker request being read, if any
+        if search_worker is not None:
+            search_worker.rows_ready.connect(self._on_rows_ready)
+            search_worker.page_done.connect(self._on_page_done)
+
+    # ---------- Qt model API ----------
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._ids)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._ids):
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            summary = self.summary(index.row())
+            return summary_text(summary) if summary else ""
+        if role == Qt.ItemDataRole.UserRole:
+            return self.summary(index.row())
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return (
+            not parent.isValid()
+            and not self._exhausted
+            and self._generation is None
+        )
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        after_seq = self._seqs[-1] if self._seqs else None
+        if self.search_worker is not None:
+            # A page already in the query cache needs no round trip
+            rows = self.db_manager.cached_page(
+                after_seq=after_seq, page_size=self.page_size, filters=self.filters
+            )
+            if rows is not None:
+                self._exhausted = len(rows) < self.page_size
+                self._append(rows)
+                return
+            self._generation = self.search_worker.request(
+                self.filters, after_seq, self.page_size
+            )
+            return
+        rows = self.db_manager.page(
+            after_seq=after_seq, page_size=self.page_size, filters=self.filters
+        )
+        self._exhausted = len(rows) < self.page_size
+        self._append(rows)
+
+    def _on_rows_ready(self, generation, rows):
+        if generation == self._generation:
+            self._append(rows)
+
+    def _on_page_done(self, generation, count):
+        if generation == self._generation:
+            self._generation = None
+            self._exhausted = count < self.page_size
+
+    def _append(self, rows):
+        # Skip rows apply_changes() already moved to the top while the page
+        # was being read
+        rows = [summary for summary in rows if summary[0] not in self._loaded_ids]
+        if not rows:
+            return
+        first = len(self._ids)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        for summary in rows:
+            self._ids.append(summary[0])
+            self._seqs.append(summary[SUMMARY_SEQ])
+            self._loaded_ids.add(summary[0])
+            self._remember(summary)
+        self.endInsertRows()
+
+    # ---------- Helpers ----------
+
+    def set_filters(self, filters=None):
+        """Reload from the top with new page() filters."""
+        self.beginResetModel()
+        self.filters = dict(filters or {})
+        self._ids = array("q")
+        self._seqs = array("q")
+        self._loaded_ids = set()
+        self._cache.clear()
+        self._exhausted = False
+        self._generation = None
+        self.endResetModel()
+        self.fetchMore()
+
+    def in_memory(self, filters):
+        """True if the first page for `filters` can be shown without a query."""
+        rows = self.db_manager.cached_page(
+            after_seq=None, page_size=self.page_size, filters=filters
+        )
+        return rows is not None
+
+    def reload(self):
+        """Re-read from the top, keeping the current filters."""
+        self.set_filters(self.filters)
+
+    def item_id(self, row):
+        return self._ids[row] if 0 <= row < len(self._ids) else None
+
+    def summary(self, row):
+        """Summary tuple for a row, read back from the database if evicted."""
+        item_id = self.item_id(row)
+        if item_id is None:
+            return None
+        summary = self._cache.get(item_id)
+        if summary is None:
+            self._load_block(row)
+            summary = self._cache.get(item_id)
+        else:
+            self._cache.move_to_end(item_id)
+        return summary
+
+    def remove_item(self, item_id):
+        """Drop a row right away (e.g. on delete, before the write lands)."""
+        row = self._row_of(item_id)
+        if row is not None:
+            self._remove_row(row)
+
+    def apply_changes(self, changes):
+        """
+        Apply committed writes, a list of (op, item_id) from apply_batch().
+
+        Each item touched is re-read once, with the current filters, in a
+        single query however many changes there are: rows that no longer
+        match (deleted, unfavorited in the favorites view, ...) are removed,
+        re-copied ones move to their new place at the top, new ones are
+        inserted and the rest are updated in place. A "clear" or "undo" can
+        hide or restore any number of rows, so it reloads instead.
+        """
+        if any(op in ("clear", "undo") for op, _ in changes):
+            self.reload()
+            return
+        # Brand-new items can't be in the model yet; skip looking for them
+        new_ids = {item_id for op, item_id in changes if op == "add"}
+        item_ids = list(dict.fromkeys(item_id for _, item_id in changes))
+        summaries = {
+            summary[0]: summary
+            for summary in self.db_manager.get_summaries(item_ids, self.filters)
+        }
+        for item_id in item_ids:
+            row = None if item_id in new_ids else self._row_of(item_id)
+            summary = summaries.get(item_id)
+            if summary is None:
+                if row is not None:
+                    self._remove_row(row)
+            elif row is None:
+                self._insert(summary)
+            else:
+                self._update(row, summary)
+
+    def _position(self, seq):
+        """Row at which an item with this seq belongs (rows are seq DESC)."""
+        return bisect_left(self._seqs, -seq, key=lambda s: -s)
+
+    def _row_of(self, item_id):
+        """Current row of an item, or None if it isn't loaded."""
+        if item_id not in self._loaded_ids:
+            return None
+        # Cached rows are found by their seq; others (rare: long evicted
+        # rows) by a scan of the id array
+        summary = self._cache.get(item_id)
+        if summary is not None:
+            row = self._position(summary[SUMMARY_SEQ])
+            if row < len(self._ids) and self._ids[row] == item_id:
+                return row
+        try:
+            return self._ids.index(item_id)
+        except ValueError:
+            return None
+
+    def _loaded(self, row):
+        """False for a position past the last row when more can be fetched."""
+        return row < len(self._ids) or self._exhausted
+
+    def _insert(self, summary):
+        row = self._position(summary[SUMMARY_SEQ])
+        if not self._loaded(row):
+            return  # fetchMore() will get to it
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._ids.insert(row, summary[0])
+        self._seqs.insert(row, summary[SUMMARY_SEQ])
+        self._loaded_ids.add(summary[0])
+        self._remember(summary)
+        self.endInsertRows()
+
+    def _update(self, row, summary):
+        seq = summary[SUMMARY_SEQ]
+        target = self._position(seq)  # counted with the row still in place
+        if target in (row, row + 1):
+            self._seqs[row] = seq
+            self._remember(summary)
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+            return
+        if not self._loaded(target):
+            self._remove_row(row)
+            return
+        self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), target)
+        del self._ids[row]
+        del self._seqs[row]
+        if target > row:
+            target -= 1
+        self._ids.insert(target, summary[0])
+        self._seqs.insert(target, seq)
+        self._remember(summary)
+        self.endMoveRows()
+
+    def _remove_row(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self._cache.pop(self._ids[row], None)
+        self._loaded_ids.discard(self._ids[row])
+        del self._ids[row]
+        del self._seqs[row]
+        self.endRemoveRows()
+
+    def _remember(self, summary):
+        self._cache[summary[0]] = summary
+        self._cache.move_to_end(summary[0])
+        while len(self._cache) > self.cache_rows:
+            self._cache.popitem(last=False)
+
+    def _load_block(self, row):
+        """Fetch the summaries of a page-sized block of rows around `row`."""
+        start = max(0, row - self.page_size // 2)
+        ids = [
+            item_id
+            for item_id in self._ids[start : start + self.page_size]
+            if item_id not in self._cache
+        ]
+        for summary in self.db_manager.get_summaries(ids):
+            self._remember(summary)
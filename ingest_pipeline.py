@@ -0,0 +1,368 @@
+"""
+Staged clipboard ingest.
+
+    capture -> normalize -> fingerprint -> dedupe -> enrich -> persist -> notify
+
+Capture (reading QMimeData) and dedupe run on the GUI thread and are cheap.
+Normalize, fingerprint and enrich run inline for text, but on a small
+bounded pool for images and files, so a folder of huge images never delays
+the next text clip. Persist and notify are the DatabaseWriter thread and its
+batch_committed signal.
+
+Items travel between stages as the usual (content, content_type, metadata)
+triple.
+"""
+
+import hashlib
+import mimetypes
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from urllib.parse import urlparse
+
+from PyQt6.QtCore import QBuffer, QByteArray, QIODevice, QObject, Qt, pyqtSignal
+from PyQt6.QtGui import QImage, QImageReader
+
+from fingerprints import fingerprint, item_fingerprint
+from thumbnailer import THUMBNAIL_SIZES
+
+STAGES = ("capture", "normalize", "fingerprint", "dedupe", "enrich")
+
+# Content types whose normalize/fingerprint/enrich stages go to the pool
+HEAVY_TYPES = ("image", "file")
+
+
+def image_fingerprint(image: QImage):
+    """
+    Cheap identity for an image's pixels, without encoding it.
+
+    Hashes the raw pixel buffer through a zero-copy memoryview; the
+    dimensions and format are part of the key so reinterpreting the
+    same bytes differently still counts as a change.
+    """
+    bits = image.constBits()
+    bits.setsize(image.sizeInBytes())
+    digest = hashlib.blake2b(memoryview(bits), digest_size=16).digest()
+    return (
+        image.width(),
+        image.height(),
+        image.format(),
+        image.bytesPerLine(),
+        digest,
+    )
+
+
+def is_url(text):
+    """Check if text looks like a URL."""
+    try:
+        result = urlparse(text)
+        return all([result.scheme, result.netloc])
+    except Exception:
+        return False
+
+
+def _encoded_image_size(data):
+    """(width, height) from the image header, without decoding pixels."""
+    buffer = QBuffer()
+    buffer.setData(QByteArray(data))
+    buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+    size = QImageReader(buffer).size()
+    if not size.isValid():
+        return None, None
+    return size.width(), size.height()
+
+
+def file_thumbnail(file_path, edge=THUMBNAIL_SIZES["icon"]):
+    """
+    Icon-size PNG for an image file, or None.
+
+    Uses QImageReader with a scaled size so codecs that support it decode
+    at reduced resolution; safe to call from worker threads.
+    """
+    try:
+        mime_type, _ = mimetypes.guess_type(file_path)
+        if not (mime_type and mime_type.startswith("image/")):
+            return None
+        reader = QImageReader(file_path)
+        reader.setAutoTransform(True)
+        size = reader.size()
+        if size.isValid() and max(size.width(), size.height()) > edge:
+            reader.setScaledSize(
+                size.scaled(edge, edge, Qt.AspectRatioMode.KeepAspectRatio)
+            )
+        image = reader.read()
+        if image.isNull():
+            return None
+        buffer = QBuffer()
+        buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+        image.save(buffer, "PNG")
+        return bytes(buffer.data())
+    except Exception as e:
+        print(f"Error creating thumbnail: {e}")
+    return None
+
+
+class IngestPipeline(QObject):
+    """
+    Run captured clipboard items through the ingest stages.
+
+    At most `max_workers` heavy items are in flight; up to `max_pending`
+    more wait in a queue, and when that overflows the oldest waiting
+    capture is dropped (the newest clipboard content matters most). When
+    items are waiting, enrichment is skipped so the backlog drains faster.
+    """
+
+    item_ready = pyqtSignal(str, str, dict)  # content, type, metadata
+
+    # Worker -> GUI thread hand-offs (queued connections)
+    _fingerprinted = pyqtSignal(object)
+    _enriched = pyqtSignal(object)
+
+    def __init__(
+        self, dedupe, max_workers: int = 2, max_pending: int = 8, parent=None
+    ):
+        """
+        dedupe: called on the GUI thread with each item's content hash;
+        returns True to keep the item.
+        """
+        super().__init__(parent)
+        self._dedupe = dedupe
+        self._max_workers = max(1, int(max_workers))
+        self._pool = ThreadPoolExecutor(
+            max_workers=self._max_workers, thread_name_prefix="ingest"
+        )
+        self._pending = deque()
+        self._max_pending = max(0, int(max_pending))
+        self._in_flight = 0
+        self._closed = False
+
+        self._stats_lock = threading.Lock()
+        self._timings = {stage: [0, 0.0, 0.0] for stage in STAGES}
+        self.dropped = 0
+        self.degraded = 0
+
+        # Last raw image encoded, so repeats skip the PNG encode
+        self._image_lock = threading.Lock()
+        self._last_image = None  # (pixel key, metadata)
+
+        self._fingerprinted.connect(self._on_fingerprinted)
+        self._enriched.connect(self._on_enriched)
+
+    # ---------- Counters ----------
+
+    def record(self, stage, seconds):
+        """Add one timing sample for a stage (any thread)."""
+        with self._stats_lock:
+            entry = self._timings[stage]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def stage_timings(self):
+        """Snapshot of {stage: {count, total_ms, avg_ms, max_ms}}."""
+        with self._stats_lock:
+            return {
+                stage: {
+                    "count": count,
+                    "total_ms": total * 1000,
+                    "avg_ms": (total / count * 1000) if count else 0.0,
+                    "max_ms": worst * 1000,
+                }
+                for stage, (count, total, worst) in self._timings.items()
+            }
+
+    def _timed(self, stage, func, *args):
+        started = perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.record(stage, perf_counter() - started)
+
+    # ---------- Entry point (GUI thread) ----------
+
+    def submit(self, content, content_type, metadata):
+        """Feed one captured item into the pipeline."""
+        if self._closed:
+            return
+        item = (content, content_type, metadata)
+        if content_type not in HEAVY_TYPES:
+            # Text is cheap end to end; never queue it behind images
+            try:
+                item = self._front_stages(item)
+            except Exception as e:
+                print(f"Ingest error: {e}")
+                return
+            self._on_fingerprinted(item, from_pool=False)
+            return
+
+        if self._in_flight < self._max_workers:
+            self._dispatch(self._run_front, item)
+            return
+        self._pending.append(item)
+        while len(self._pending) > self._max_pending:
+            self._pending.popleft()
+            self.dropped += 1
+
+    def shutdown(self):
+        """Stop accepting work; results still in flight are discarded."""
+        self._closed = True
+        self._pending.clear()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    # ---------- Scheduling (GUI thread) ----------
+
+    def _dispatch(self, func, item):
+        self._in_flight += 1
+        self._pool.submit(func, item)
+
+    def _job_done(self):
+        self._in_flight -= 1
+        while (
+            self._pending
+            and not self._closed
+            and self._in_flight < self._max_workers
+        ):
+            self._dispatch(self._run_front, self._pending.popleft())
+
+    def _on_fingerprinted(self, item, from_pool=True):
+        if from_pool:
+            self._job_done()
+        if item is None or self._closed:
+            return
+
+        content, content_type, metadata = item
+        started = perf_counter()
+        keep = self._dedupe(metadata.get("content_hash", b""))
+        self.record("dedupe", perf_counter() - started)
+        if not keep:
+            return
+
+        if not self._needs_enrichment(item):
+            self.item_ready.emit(content, content_type, metadata)
+        elif self._pending:
+            # Backpressure: persist now, without the optional extras
+            self.degraded += 1
+            self.item_ready.emit(content, content_type, metadata)
+        else:
+            self._dispatch(self._run_enrich, item)
+
+    def _on_enriched(self, item):
+        self._job_done()
+        if item is not None and not self._closed:
+            self.item_ready.emit(*item)
+
+    # ---------- Stages (worker threads) ----------
+
+    def _run_front(self, item):
+        try:
+            item = self._front_stages(item)
+        except Exception as e:
+            print(f"Ingest error: {e}")
+            item = None
+        self._fingerprinted.emit(item)
+
+    def _run_enrich(self, item):
+        try:
+            item = self._timed("enrich", self.enrich, item)
+        except Exception as e:
+            # Enrichment is optional; keep the item without it
+            print(f"Ingest enrich error: {e}")
+        self._enriched.emit(item)
+
+    def _front_stages(self, item):
+        item = self._timed("normalize", self.normalize, item)
+        if item is None:
+            return None
+        return self._timed("fingerprint", self.fingerprint, item)
+
+    def normalize(self, item):
+        """Turn raw captured data into storable fields, or None to drop it."""
+        content, content_type, metadata = item
+        if content_type == "file":
+            file_path = metadata["file_path"]
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                return content, content_type, {"file_path": file_path}
+            metadata = {
+                "file_path": file_path,
+                "file_size": stat.st_size,
+                "mime_type": mimetypes.guess_type(file_path)[0]
+                or "application/octet-stream",
+            }
+            return content, content_type, metadata
+
+        if content_type == "image":
+            if "image" in metadata:
+                return "", content_type, self._encode_image(metadata["image"])
+            data = metadata["payload"]
+            width, height = _encoded_image_size(data)
+            if width is None:
+                return None
+            metadata = dict(
+                metadata,
+                file_size=len(data),
+                image_width=width,
+                image_height=height,
+            )
+            return "", content_type, metadata
+
+        metadata = {}
+        if is_url(content):
+            metadata["is_url"] = True
+        return content, content_type, metadata
+
+    def _encode_image(self, image: QImage):
+        pixel_key = image_fingerprint(image)
+        with self._image_lock:
+            if self._last_image and self._last_image[0] == pixel_key:
+                return self._last_image[1]
+
+        buffer = QBuffer()
+        buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+        image.save(buffer, "PNG")
+        image_bytes = bytes(buffer.data())
+        # Raw bytes travel in metadata; `content` stays empty
+        metadata = {
+            "mime_type": "image/png",
+            "file_size": len(image_bytes),
+            "payload": image_bytes,
+            "image_width": image.width(),
+            "image_height": image.height(),
+            "content_hash": fingerprint(image_bytes),
+        }
+        with self._image_lock:
+            self._last_image = (pixel_key, metadata)
+        return metadata
+
+    def fingerprint(self, item):
+        """Attach metadata['content_hash'], the item's one and only hash."""
+        content, content_type, metadata = item
+        if "content_hash" not in metadata:
+            metadata = dict(
+                metadata,
+                content_hash=item_fingerprint(content, metadata.get("payload")),
+            )
+        return content, content_type, metadata
+
+    def _needs_enrichment(self, item):
+        _, content_type, metadata = item
+        mime_type = metadata.get("mime_type") or ""
+        return content_type == "file" and mime_type.startswith("image/")
+
+    def enrich(self, item):
+        """Add optional extras (file thumbnails) that can be skipped."""
+        content, content_type, metadata = item
+        thumbnail = file_thumbnail(metadata["file_path"])
+        if thumbnail is not None:
+            metadata = dict(metadata, thumbnail=thumbnail)
+        return content, content_type, metadata
+
+    def run_stages(self, content, content_type, metadata):
+        """Run normalize, fingerprint and enrich synchronously (no dedupe)."""
+        item = self._front_stages((content, content_type, metadata))
+        if item is not None and self._needs_enrichment(item):
+            item = self.enrich(item)
+        return item
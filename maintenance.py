@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Keeping the database file the size of its live data.
+
+Databases created by this app use auto_vacuum=INCREMENTAL, so pages freed by
+deletes can be handed back a chunk at a time; MaintenanceJob does that (and
+runs PRAGMA optimize) only while the app is idle. Older databases, or one
+that needs a full rewrite, are compacted offline (the app does it at startup,
+before opening the database) with VACUUM INTO and an atomic swap:
+
+    python maintenance.py compact clipboard_history.db
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+from pathlib import Path
+from time import monotonic
+
+from background_jobs import PeriodicJob
+
+# PRAGMA auto_vacuum value for INCREMENTAL
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def needs_compaction(db_path) -> bool:
+    """True if the database can't return free pages incrementally yet."""
+    if not Path(db_path).exists():
+        return False
+    conn = sqlite3.connect(db_path)
+    try:
+        return (
+            conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+            != AUTO_VACUUM_INCREMENTAL
+        )
+    finally:
+        conn.close()
+
+
+def compact_database(db_path):
+    """
+    Rewrite the database compactly, with auto_vacuum=INCREMENTAL.
+
+    Nothing else may have the database open: an exclusive lock is taken
+    first (raising sqlite3.OperationalError, "database is locked", if any
+    other connection exists) and held until the file has been swapped. The
+    WAL is checkpointed completely, then the copy is written next to the
+    original with VACUUM INTO, checked, fsynced and renamed over it, so a
+    crash at any point leaves either the old or the new file intact.
+    Returns (old_size, new_size) in bytes.
+    """
+    db_path = Path(db_path)
+    tmp_path = db_path.with_name(db_path.name + ".compact")
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    conn = sqlite3.connect(db_path, timeout=1.0, isolation_level=None)
+    try:
+        # Kept until the connection closes, even in WAL mode; any other
+        # open connection (another instance, a job thread) makes this fail
+        conn.execute("PRAGMA locking_mode = EXCLUSIVE")
+        conn.execute("BEGIN EXCLUSIVE")
+        conn.execute("COMMIT")
+
+        # Fold the WAL into the main file so the copy sees everything
+        busy, log_frames, checkpointed = conn.execute(
+            "PRAGMA wal_checkpoint(TRUNCATE)"
+        ).fetchone()
+        if busy or log_frames != checkpointed:
+            raise sqlite3.OperationalError(
+                f"WAL checkpoint incomplete ({checkpointed} of {log_frames} "
+                "frames)"
+            )
+        conn.execute(f"PRAGMA auto_vacuum = {AUTO_VACUUM_INCREMENTAL}")
+        conn.execute("VACUUM INTO ?", (str(tmp_path),))
+
+        check = sqlite3.connect(tmp_path)
+        try:
+            result = check.execute("PRAGMA quick_check").fetchone()[0]
+        finally:
+            check.close()
+        if result != "ok":
+            raise sqlite3.DatabaseError(f"Compacted copy failed check: {result}")
+
+        with open(tmp_path, "rb+") as f:
+            os.fsync(f.fileno())
+        old_size = db_path.stat().st_size
+        if os.name == "nt":
+            # Windows can't rename over an open file; if anything else
+            # opened it since, os.replace() fails rather than losing writes
+            conn.close()
+        for suffix in ("-wal", "-shm"):
+            sidecar = db_path.with_name(db_path.name + suffix)
+            if sidecar.exists():
+                sidecar.unlink()
+        os.replace(tmp_path, db_path)
+        _fsync_directory(db_path.parent)
+    finally:
+        conn.close()
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return old_size, db_path.stat().st_size
+
+
+def _fsync_directory(path):
+    """Persist a rename (not supported on Windows, where it's not needed)."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class MaintenanceJob(PeriodicJob):
+    """
+    Return free pages and refresh planner statistics while the app is idle.
+
+    "Idle" means no history reads or writes from the app for `idle_seconds`
+    (see DatabaseManager.last_activity). Free pages are released with
+    PRAGMA incremental_vacuum, `vacuum_pages` at a time, once more than
+    `min_free_pages` have piled up (SQLite reuses a few free pages anyway).
+    PRAGMA optimize runs at most every `optimize_interval` seconds.
+    """
+
+    name = "maintenance"
+
+    def __init__(
+        self,
+        db_manager,
+        interval_seconds: float = 60.0,
+        idle_seconds: float = 30.0,
+        vacuum_pages: int = 1024,
+        min_free_pages: int = 256,
+        optimize_interval: float = 3600.0,
+    ):
+        super().__init__(interval_seconds=interval_seconds)
+        self.db_manager = db_manager
+        self.idle_seconds = idle_seconds
+        self.vacuum_pages = vacuum_pages
+        self.min_free_pages = min_free_pages
+        self.optimize_interval = optimize_interval
+        self._last_optimize = monotonic()
+
+    def _idle(self):
+        return monotonic() - self.db_manager.last_activity >= self.idle_seconds
+
+    def step(self):
+        if not self._idle():
+            return False
+
+        connections = self.db_manager.connections
+        with connections.writer() as conn:
+            auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if (
+                auto_vacuum == AUTO_VACUUM_INCREMENTAL
+                and free_pages > self.min_free_pages
+            ):
+                # execute() would only step it once, freeing a single page
+                conn.executescript(
+                    f"PRAGMA incremental_vacuum({self.vacuum_pages});"
+                )
+                return True
+
+        if monotonic() - self._last_optimize >= self.optimize_interval:
+            self._last_optimize = monotonic()
+            with connections.writer() as conn:
+                conn.execute("PRAGMA optimize")
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Clipboard history database maintenance"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    compact = sub.add_parser(
+        "compact", help="rewrite the database (app must not be running)"
+    )
+    compact.add_argument("database", help="clipboard_history.db")
+
+    args = parser.parse_args(argv)
+    try:
+        old_size, new_size = compact_database(args.database)
+    except sqlite3.Error as e:
+        print(f"❌ Compaction failed: {e}")
+        return 1
+    print(f"Compacted {args.database}: {old_size:,} -> {new_size:,} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
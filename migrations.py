@@ -0,0 +1,396 @@
+import base64
+import binascii
+import sqlite3
+
+from background_jobs import PeriodicJob
+from database_manager import make_snippet, png_dimensions
+from fingerprints import item_fingerprint
+
+
+class PayloadMigrationJob(PeriodicJob):
+    """
+    Move legacy base64 image rows into the raw `payload` BLOB column.
+
+    Works in small batches, each in its own short write transaction, so the
+    app stays responsive. Progress is implicit (image rows with neither a
+    payload nor a blob_key are still pending), which makes the job resumable
+    across restarts. Images already in the blob store are left alone.
+    """
+
+    name = "payload-migration"
+
+    def __init__(self, db_manager, batch_size: int = 50):
+        super().__init__(interval_seconds=300.0)
+        self.db_manager = db_manager
+        self.batch_size = batch_size
+
+    def step(self):
+        connections = self.db_manager.connections
+        rows = (
+            connections.reader()
+            .execute(
+                """
+                SELECT id, content FROM clipboard_history
+                WHERE content_type = 'image' AND payload IS NULL
+                  AND blob_key IS NULL
+                LIMIT ?
+            """,
+                (self.batch_size,),
+            )
+            .fetchall()
+        )
+        if not rows:
+            return False
+
+        with connections.writer() as conn:
+            for item_id, content in rows:
+                try:
+                    data = base64.b64decode(content, validate=True)
+                except (binascii.Error, ValueError, TypeError):
+                    # Unreadable row: mark it done and leave `content` alone
+                    conn.execute(
+                        "UPDATE clip_payload SET payload = X'' WHERE id = ?",
+                        (item_id,),
+                    )
+                    continue
+
+                width, height = png_dimensions(data)
+                params = {
+                    "id": item_id,
+                    "payload": data,
+                    "width": width,
+                    "height": height,
+                    "hash": item_fingerprint("", data),
+                }
+                # Old rows kept a second full copy of the PNG as "thumbnail"
+                conn.execute(
+                    """
+                    UPDATE clip_payload
+                    SET payload = :payload, content = '',
+                        thumbnail = CASE WHEN thumbnail = :payload
+                                         THEN NULL ELSE thumbnail END
+                    WHERE id = :id
+                """,
+                    params,
+                )
+                # The snippet is cleared so it gets rebuilt with dimensions
+                update = """
+                    UPDATE clip_meta
+                    SET image_width = :width, image_height = :height,
+                        display_snippet = NULL
+                        {hash_clause}
+                    WHERE id = :id
+                """
+                try:
+                    conn.execute(
+                        update.format(hash_clause=", content_hash = :hash"),
+                        params,
+                    )
+                except sqlite3.IntegrityError:
+                    # Same image was captured again since the upgrade; keep
+                    # the legacy hash and let HashMigrationJob merge them
+                    conn.execute(update.format(hash_clause=""), params)
+        return len(rows) == self.batch_size
+
+
+class SnippetBackfillJob(PeriodicJob):
+    """Fill display_snippet/flags for rows stored before the column existed."""
+
+    name = "snippet-backfill"
+
+    # Enough to build a snippet and detect a URL without reading huge blobs
+    PREFIX_CHARS = 4096
+
+    def __init__(self, db_manager, batch_size: int = 500):
+        super().__init__(interval_seconds=300.0)
+        self.db_manager = db_manager
+        self.batch_size = batch_size
+
+    def step(self):
+        connections = self.db_manager.connections
+        rows = (
+            connections.reader()
+            .execute(
+                """
+                SELECT id, content_type,
+                       CASE WHEN content_type = 'image' THEN ''
+                            ELSE substr(clip_text(content, blob_key, codec), 1, ?)
+                       END,
+                       file_path, file_size, image_width, image_height
+                FROM clipboard_history
+                WHERE display_snippet IS NULL
+                LIMIT ?
+            """,
+                (self.PREFIX_CHARS, self.batch_size),
+            )
+            .fetchall()
+        )
+        if not rows:
+            return False
+
+        updates = []
+        for item_id, content_type, prefix, *details in rows:
+            snippet, flags = make_snippet(content_type, prefix, *details)
+            updates.append((snippet, flags, item_id))
+
+        with connections.writer() as conn:
+            conn.executemany(
+                "UPDATE clip_meta SET display_snippet = ?, flags = ? WHERE id = ?",
+                updates,
+            )
+        return len(rows) == self.batch_size
+
+
+class HashMigrationJob(PeriodicJob):
+    """
+    Re-key rows whose content_hash is still a legacy SHA-256 hex string.
+
+    Each row gets the BLAKE2b fingerprint of its payload or text. If the
+    same content was captured again since the upgrade, the old row is merged
+    into the newer one (favorite flag and access count carry over).
+    """
+
+    name = "hash-migration"
+
+    def __init__(self, db_manager, batch_size: int = 200):
+        super().__init__(interval_seconds=300.0)
+        self.db_manager = db_manager
+        self.batch_size = batch_size
+
+    def step(self):
+        connections = self.db_manager.connections
+        # Legacy base64 images are left to PayloadMigrationJob, which
+        # re-keys them from their decoded bytes
+        rows = (
+            connections.reader()
+            .execute(
+                """
+                SELECT id, content, payload FROM clipboard_history
+                WHERE typeof(content_hash) = 'text'
+                  AND NOT (content_type = 'image' AND payload IS NULL)
+                ORDER BY id
+                LIMIT ?
+            """,
+                (self.batch_size,),
+            )
+            .fetchall()
+        )
+        if not rows:
+            self._finish()
+            return False
+
+        with connections.writer() as conn:
+            cursor = conn.cursor()
+            for item_id, content, payload in rows:
+                content_hash = item_fingerprint(content, payload)
+                try:
+                    cursor.execute(
+                        "UPDATE clip_meta SET content_hash = ? WHERE id = ?",
+                        (content_hash, item_id),
+                    )
+                except sqlite3.IntegrityError:
+                    self._merge(cursor, item_id, content_hash)
+        return len(rows) == self.batch_size
+
+    def _merge(self, cursor, item_id, content_hash):
+        """Fold a legacy row into the row that already has its new hash."""
+        cursor.execute(
+            """
+            UPDATE clip_meta
+            SET is_favorite = MAX(is_favorite,
+                    (SELECT is_favorite FROM clip_meta WHERE id = :old)),
+                access_count = access_count + 1 +
+                    (SELECT access_count FROM clip_meta WHERE id = :old)
+            WHERE content_hash = :hash
+        """,
+            {"old": item_id, "hash": content_hash},
+        )
+        self.db_manager._delete_item(cursor, item_id)
+
+    def _finish(self):
+        pending = (
+            self.db_manager.connections.reader()
+            .execute(
+                "SELECT 1 FROM clip_meta WHERE typeof(content_hash) = 'text' LIMIT 1"
+            )
+            .fetchone()
+        )
+        if pending is None:
+            with self.db_manager.connections.writer() as conn:
+                conn.execute("DROP INDEX IF EXISTS idx_legacy_hash")
+
+
+class BlobMigrationJob(PeriodicJob):
+    """
+    Move payloads (and text) stored before the blob store existed out of
+    SQLite once they exceed the blob threshold.
+
+    New items are externalized on insert, so once a pass finds nothing left
+    the job goes idle for the rest of the session. Rows still carrying a
+    legacy hash wait for HashMigrationJob, which needs their inline data.
+    """
+
+    name = "blob-migration"
+
+    def __init__(self, db_manager, batch_size: int = 20):
+        super().__init__(interval_seconds=300.0)
+        self.db_manager = db_manager
+        self.batch_size = batch_size
+        self._done = False
+
+    def step(self):
+        if self._done:
+            return False
+        connections = self.db_manager.connections
+        rows = (
+            connections.reader()
+            .execute(
+                """
+                SELECT p.id, p.content, p.payload, p.codec
+                FROM clip_payload AS p JOIN clip_meta AS m ON m.id = p.id
+                WHERE p.blob_key IS NULL AND typeof(m.content_hash) = 'blob'
+                  AND (length(p.payload) > :threshold
+                       OR (m.content_type = 'text'
+                           AND length(CAST(p.content AS BLOB)) > :threshold))
+                LIMIT :limit
+            """,
+                {
+                    "threshold": self.db_manager.blob_threshold,
+                    "limit": self.batch_size,
+                },
+            )
+            .fetchall()
+        )
+        if not rows:
+            self._done = True
+            return False
+
+        # Decompressing and writing blob files happens outside the write
+        # transaction; a blob left unused below is removed by the blob GC
+        updates = []
+        for item_id, content, payload, old_codec in rows:
+            if old_codec is not None:
+                content = self.db_manager.compressor.decompress(
+                    old_codec, content
+                )
+            updates.append(
+                (*self.db_manager._externalize(content, payload), item_id, old_codec)
+            )
+
+        with connections.writer() as conn:
+            for update in updates:
+                # Skipped if the row was changed or deleted in the meantime
+                cursor = conn.execute(
+                    """
+                    UPDATE clip_payload
+                    SET content = ?, payload = ?, blob_key = ?, codec = ?
+                    WHERE id = ? AND blob_key IS NULL AND codec IS ?
+                """,
+                    update,
+                )
+                if cursor.rowcount:
+                    # Recomputed by RetentionJob
+                    conn.execute(
+                        "UPDATE clip_meta SET byte_size = NULL WHERE id = ?",
+                        (update[4],),
+                    )
+        return len(rows) == self.batch_size
+
+
+class CompressionJob(PeriodicJob):
+    """
+    Compress text rows stored before compression existed.
+
+    If zstd is available and no dictionary exists yet, one is first trained
+    from recent text clips, so that short clips compress as well. Rows are
+    walked by id once per session; text that doesn't shrink is left as-is.
+    Legacy-hash rows wait for HashMigrationJob, which needs their plain text.
+    """
+
+    name = "compression"
+
+    # Recent text clips sampled when training a dictionary
+    SAMPLE_ROWS = 2000
+
+    def __init__(self, db_manager, batch_size: int = 100):
+        super().__init__(interval_seconds=300.0)
+        self.db_manager = db_manager
+        self.batch_size = batch_size
+        self._last_id = 0
+        self._trained = False
+
+    def step(self):
+        compressor = self.db_manager.compressor
+        if compressor.wants_dictionary and not self._trained:
+            self._trained = True
+            self._train()
+
+        connections = self.db_manager.connections
+        rows = (
+            connections.reader()
+            .execute(
+                """
+                SELECT p.id, clip_text(p.content, p.blob_key, NULL), p.blob_key
+                FROM clip_payload AS p JOIN clip_meta AS m ON m.id = p.id
+                WHERE p.id > :last AND p.codec IS NULL
+                  AND m.content_type = 'text'
+                  AND typeof(m.content_hash) = 'blob'
+                  AND (p.blob_key IS NOT NULL
+                       OR length(CAST(p.content AS BLOB)) >= :min_size)
+                ORDER BY p.id
+                LIMIT :limit
+            """,
+                {
+                    "last": self._last_id,
+                    "min_size": compressor.min_size,
+                    "limit": self.batch_size,
+                },
+            )
+            .fetchall()
+        )
+        if not rows:
+            return False
+        self._last_id = rows[-1][0]
+
+        # Compress (and write any blob files) before taking the writer lock
+        updates = []
+        for item_id, text, old_blob_key in rows:
+            content, _, blob_key, codec = self.db_manager._externalize(text, None)
+            if codec is not None:
+                updates.append((content, blob_key, codec, item_id, old_blob_key))
+
+        with connections.writer() as conn:
+            for update in updates:
+                # Skipped if the row was changed or deleted in the meantime
+                cursor = conn.execute(
+                    """
+                    UPDATE clip_payload
+                    SET content = ?, payload = NULL, blob_key = ?, codec = ?
+                    WHERE id = ? AND codec IS NULL AND blob_key IS ?
+                """,
+                    update,
+                )
+                if cursor.rowcount:
+                    conn.execute(
+                        "UPDATE clip_meta SET byte_size = NULL WHERE id = ?",
+                        (update[3],),
+                    )
+        return len(rows) == self.batch_size
+
+    def _train(self):
+        samples = [
+            text
+            for (text,) in self.db_manager.connections.reader().execute(
+                """
+                SELECT clip_text(p.content, p.blob_key, p.codec)
+                FROM clip_meta AS m JOIN clip_payload AS p ON p.id = m.id
+                WHERE m.content_type = 'text' AND p.blob_key IS NULL
+                ORDER BY m.seq DESC
+                LIMIT ?
+            """,
+                (self.SAMPLE_ROWS,),
+            )
+        ]
+        data = self.db_manager.compressor.train(samples)
+        if data is not None:
+            self.db_manager.add_compression_dictionary(data)
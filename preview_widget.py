@@ -1,4 +1,3 @@
-import base64
 import os
 from datetime import datetime
 from urllib.parse import urlparse
@@ -7,6 +6,11 @@ from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QPixmap
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QTabWidget, QTextEdit, QScrollArea, QGroupBox
 
+from database_manager import image_payload
+from thumbnailer import THUMBNAIL_SIZES
+
+PREVIEW_SIZE = THUMBNAIL_SIZES["preview"]
+
 
 class PreviewWidget(QWidget):
     """Enhanced preview widget supporting images and files."""
@@ -78,7 +82,6 @@ class PreviewWidget(QWidget):
         file_path = item_data[3]
         file_size = item_data[4]
         mime_type = item_data[5]
-        thumbnail = item_data[6]
         timestamp = item_data[7]
         is_favorite = item_data[8]
         access_count = item_data[9]
@@ -91,13 +94,13 @@ class PreviewWidget(QWidget):
 
         # Show appropriate tab
         if content_type == "image":
-            self.display_image(content, thumbnail)
+            self.display_image(item_data)
             self.tab_widget.setCurrentIndex(1)
         else:
             self.tab_widget.setCurrentIndex(0)
 
         # Update text preview
-        self.display_text_preview(content, content_type, file_path)
+        self.display_text_preview(content, content_type, file_path, item_data)
 
         # Update info panel
         self.update_info_panel(
@@ -109,35 +112,36 @@ class PreviewWidget(QWidget):
             access_count,
         )
 
-    def display_image(self, b64_content, thumbnail_bytes):
+    def display_image(self, item_data):
         """Display image in preview."""
         try:
-            if thumbnail_bytes:
-                # Use thumbnail for preview
-                pixmap = QPixmap()
-                pixmap.loadFromData(thumbnail_bytes)
+            pixmap = QPixmap()
+            preview_thumbnail = item_data[13] if len(item_data) > 13 else None
+            if preview_thumbnail:
+                # Pre-rendered at preview size; no full decode or rescale
+                pixmap.loadFromData(preview_thumbnail)
             else:
-                # Decode base64 image
-                image_data = base64.b64decode(b64_content)
-                pixmap = QPixmap()
-                pixmap.loadFromData(image_data)
+                # Thumbnail not generated yet: fall back to the full image
+                pixmap.loadFromData(image_payload(item_data))
+                if not pixmap.isNull():
+                    pixmap = pixmap.scaled(
+                        PREVIEW_SIZE,
+                        PREVIEW_SIZE,
+                        Qt.AspectRatioMode.KeepAspectRatio,
+                        Qt.TransformationMode.SmoothTransformation,
+                    )
 
             if not pixmap.isNull():
-                # Scale image to fit preview
-                scaled_pixmap = pixmap.scaled(
-                    300,
-                    300,
-                    Qt.AspectRatioMode.KeepAspectRatio,
-                    Qt.TransformationMode.SmoothTransformation,
-                )
-                self.image_label.setPixmap(scaled_pixmap)
+                self.image_label.setPixmap(pixmap)
             else:
                 self.image_label.setText("Unable to load image")
 
         except Exception as e:
             self.image_label.setText(f"Error loading image: {e}")
 
-    def display_text_preview(self, content, content_type, file_path):
+    def display_text_preview(
+        self, content, content_type, file_path, item_data=None
+    ):
         """Display text preview with appropriate formatting."""
         if content_type == "file":
             preview_text = f"File: {file_path}\n\n"
@@ -149,9 +153,13 @@ class PreviewWidget(QWidget):
                 preview_text += "Status: File not found"
 
         elif content_type == "image":
-            preview_text = "Image data (Base64 encoded)\n\n"
-            preview_text += f"Data length: {len(content)} characters\n"
-            preview_text += f"Preview: {content[:100]}..."
+            preview_text = "Image data\n\n"
+            if item_data is not None:
+                width, height = item_data[11], item_data[12]
+                if width and height:
+                    preview_text += f"Dimensions: {width} x {height}\n"
+                if item_data[4]:
+                    preview_text += f"Data length: {item_data[4]} bytes"
 
         else:
             # Regular text with URL detection
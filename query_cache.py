@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+
+# Default memory budget for cached history query results
+QUERY_CACHE_BYTES = 8 * 1024 * 1024
+
+# Rough cost of a result row (tuple, ints) besides its text and bytes
+ROW_OVERHEAD = 120
+
+
+def estimate_size(rows) -> int:
+    """Approximate memory held by a list of result rows."""
+    size = 0
+    for row in rows:
+        size += ROW_OVERHEAD
+        for value in row:
+            if isinstance(value, (str, bytes)):
+                size += len(value)
+    return size
+
+
+class QueryCache:
+    """
+    Byte-bounded LRU of query results for one write generation.
+
+    Results are stored with the write generation they were read at
+    (DatabaseManager.write_generation, taken *before* running the query).
+    Any write makes every entry stale, so the whole cache is dropped the
+    first time a newer generation is seen, and results read under an older
+    one are never stored. Thread-safe.
+    """
+
+    def __init__(self, max_bytes: int = QUERY_CACHE_BYTES):
+        self.max_bytes = int(max_bytes)
+        self._entries = OrderedDict()  # key -> (rows, size)
+        self._bytes = 0
+        self._generation = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, generation):
+        """Cached rows for `key`, or None if absent or stale."""
+        with self._lock:
+            self._advance(generation)
+            entry = self._entries.get(key)
+            if entry is None or generation != self._generation:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, generation, rows):
+        """Remember `rows` (treated as read-only) read at `generation`."""
+        size = estimate_size(rows)
+        if not self.max_bytes or size > self.max_bytes:
+            return
+        with self._lock:
+            self._advance(generation)
+            if generation != self._generation:
+                return  # a write landed while the query ran
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (rows, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _advance(self, generation):
+        if self._generation is None or generation > self._generation:
+            self._entries.clear()
+            self._bytes = 0
+            self._generation = generation
@@ -0,0 +1,303 @@
+"""
+Retention rules, the background job that enforces them, and the purger
+that finishes deletes once they can no longer be undone.
+
+Nothing is pruned unless a policy says so. Favorites are exempt by
+default. When history has to shrink, the least valuable items go first:
+those used longest ago, with every re-copy (access_count) counting as if
+the item were ACCESS_WEIGHT copies newer.
+"""
+
+from background_jobs import PeriodicJob
+from database_manager import UNDO_WINDOW
+
+# How many positions in the history one re-copy is worth when evicting
+ACCESS_WEIGHT = 20
+
+# Pages of search index merged per step; deletes only leave tombstones in
+# the index until its segments are merged
+FTS_MERGE_PAGES = 256
+
+
+class RetentionPolicy:
+    """
+    Limits on how much history to keep; every limit is optional.
+
+    max_items: keep at most this many items.
+    max_bytes: keep the stored size (text, images, blobs, thumbnails) below
+        this many bytes.
+    max_age_days: {content_type: days} since an item was last copied;
+        the "all" key applies to types without their own entry.
+    keep_favorites: never prune favorites (they still count toward the
+        item and byte limits).
+    """
+
+    def __init__(
+        self,
+        max_items=None,
+        max_bytes=None,
+        max_age_days=None,
+        keep_favorites=True,
+        access_weight=ACCESS_WEIGHT,
+    ):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.max_age_days = dict(max_age_days or {})
+        self.keep_favorites = keep_favorites
+        self.access_weight = access_weight
+
+    def __bool__(self):
+        return bool(self.max_items or self.max_bytes or self.max_age_days)
+
+    def age_rules(self):
+        """Yield (content_types, excluded_types, days) for each age limit."""
+        typed = [t for t in self.max_age_days if t != "all"]
+        for content_type in typed:
+            yield [content_type], [], self.max_age_days[content_type]
+        if "all" in self.max_age_days:
+            yield [], typed, self.max_age_days["all"]
+
+
+class RetentionJob(PeriodicJob):
+    """
+    Enforce a RetentionPolicy a small batch at a time.
+
+    Each step deletes at most `batch_size` items in one short write
+    transaction, so capture never waits long on the writer lock. Once
+    nothing is left to prune, the search index is merged, again in small
+    steps, so its pages are freed too. MaintenanceJob hands free pages back
+    to the filesystem and BlobGarbageCollectionJob removes pruned blobs.
+    """
+
+    name = "retention"
+
+    def __init__(
+        self,
+        db_manager,
+        policy: RetentionPolicy,
+        interval_seconds: float = 600.0,
+        batch_size: int = 100,
+    ):
+        super().__init__(interval_seconds=interval_seconds)
+        self.db_manager = db_manager
+        self.policy = policy
+        self.batch_size = batch_size
+        self.pruned = 0
+        self._needs_merge = False
+
+    def step(self):
+        if self._backfill_sizes():
+            return True
+        victims = (
+            self._expired() or self._over_item_limit() or self._over_byte_limit()
+        )
+        if victims:
+            self._delete(victims)
+            return True
+        if self._needs_merge:
+            return self._merge_index()
+        return False
+
+    def _evictable(self):
+        return "is_favorite = 0" if self.policy.keep_favorites else "1"
+
+    def _backfill_sizes(self):
+        """Compute byte_size for rows stored before it was tracked."""
+        rows = (
+            self.db_manager.connections.reader()
+            .execute(
+                """
+                SELECT m.id, p.blob_key,
+                       COALESCE(length(CAST(p.content AS BLOB)), 0)
+                       + COALESCE(length(p.payload), 0)
+                       + COALESCE(length(p.thumbnail), 0)
+                       + COALESCE(length(p.preview_thumbnail), 0)
+                FROM clip_meta AS m JOIN clip_payload AS p ON p.id = m.id
+                WHERE m.byte_size IS NULL
+                LIMIT ?
+            """,
+                (self.batch_size * 5,),
+            )
+            .fetchall()
+        )
+        if not rows:
+            return False
+        blobs = self.db_manager.blobs
+        updates = [
+            (size + (blobs.size(blob_key) if blob_key else 0), item_id)
+            for item_id, blob_key, size in rows
+        ]
+        with self.db_manager.connections.writer() as conn:
+            conn.executemany(
+                "UPDATE clip_meta SET byte_size = ? WHERE id = ?", updates
+            )
+        return True
+
+    def _expired(self):
+        reader = self.db_manager.connections.reader()
+        for types, excluded, days in self.policy.age_rules():
+            conditions = [self._evictable(), "timestamp < datetime('now', ?)"]
+            params = [f"-{float(days)} days"]
+            if types:
+                conditions.append(
+                    f"content_type IN ({', '.join('?' for _ in types)})"
+                )
+                params.extend(types)
+            if excluded:
+                conditions.append(
+                    f"content_type NOT IN ({', '.join('?' for _ in excluded)})"
+                )
+                params.extend(excluded)
+            rows = reader.execute(
+                f"""
+                SELECT id FROM clip_meta
+                WHERE {' AND '.join(conditions)}
+                LIMIT ?
+            """,
+                params + [self.batch_size],
+            ).fetchall()
+            if rows:
+                return [item_id for (item_id,) in rows]
+        return []
+
+    def _least_valuable(self, limit):
+        """Evictable (id, byte_size) rows, least valuable first."""
+        return (
+            self.db_manager.connections.reader()
+            .execute(
+                f"""
+                SELECT id, COALESCE(byte_size, 0) FROM clip_meta
+                WHERE {self._evictable()}
+                ORDER BY seq + access_count * ?, seq
+                LIMIT ?
+            """,
+                (self.policy.access_weight, limit),
+            )
+            .fetchall()
+        )
+
+    def _over_item_limit(self):
+        if not self.policy.max_items:
+            return []
+        total = (
+            self.db_manager.connections.reader()
+            .execute("SELECT COUNT(*) FROM clip_meta")
+            .fetchone()[0]
+        )
+        excess = total - self.policy.max_items
+        if excess <= 0:
+            return []
+        return [
+            item_id
+            for item_id, _ in self._least_valuable(
+                min(excess, self.batch_size)
+            )
+        ]
+
+    def _over_byte_limit(self):
+        if not self.policy.max_bytes:
+            return []
+        total = (
+            self.db_manager.connections.reader()
+            .execute("SELECT COALESCE(SUM(byte_size), 0) FROM clip_meta")
+            .fetchone()[0]
+        )
+        excess = total - self.policy.max_bytes
+        victims = []
+        for item_id, size in self._least_valuable(self.batch_size):
+            if excess <= 0:
+                break
+            victims.append(item_id)
+            excess -= size
+        return victims
+
+    def _delete(self, item_ids):
+        with self.db_manager.connections.writer() as conn:
+            cursor = conn.cursor()
+            for item_id in item_ids:
+                self.db_manager._delete_item(cursor, item_id)
+        self.pruned += len(item_ids)
+        self._needs_merge = self.db_manager.fts_enabled
+
+    def _merge_index(self):
+        """Merge a few index pages; True while there is more to merge."""
+        with self.db_manager.connections.writer() as conn:
+            before = conn.total_changes
+            # A negative page count merges segments of any level, which is
+            # what actually drops the tombstones
+            conn.execute(
+                "INSERT INTO clipboard_fts(clipboard_fts, rank) VALUES ('merge', ?)",
+                (-FTS_MERGE_PAGES,),
+            )
+            # FTS5 reports real work as two or more changes
+            self._needs_merge = conn.total_changes - before >= 2
+        return True
+
+
+class PurgeJob(PeriodicJob):
+    """
+    Remove rows hidden by delete_item()/clear_history() for good.
+
+    Only deletes older than the undo window are touched, in chunks of
+    `chunk_size` rows per write transaction, so clearing even a very large
+    history never holds the writer lock for long. A tombstone is dropped
+    once it no longer hides anything.
+    """
+
+    name = "purge"
+
+    def __init__(
+        self,
+        db_manager,
+        interval_seconds: float = UNDO_WINDOW,
+        chunk_size: int = 500,
+    ):
+        super().__init__(interval_seconds=interval_seconds)
+        self.db_manager = db_manager
+        self.chunk_size = chunk_size
+
+    def step(self):
+        connections = self.db_manager.connections
+        deletion = (
+            connections.reader()
+            .execute(
+                """
+                SELECT id, max_seq, keep_favorites FROM deletions
+                WHERE created <= datetime('now', ?)
+                ORDER BY id LIMIT 1
+            """,
+                (f"-{UNDO_WINDOW} seconds",),
+            )
+            .fetchone()
+        )
+        if deletion is None:
+            return False
+
+        deletion_id, max_seq, keep_favorites = deletion
+        # Rows are picked inside the write transaction so one that was
+        # copied again (and so un-hidden) in the meantime is never purged
+        with connections.writer() as conn:
+            cursor = conn.cursor()
+            if max_seq is None:
+                cursor.execute(
+                    "SELECT id FROM clip_meta WHERE deleted_by = ? LIMIT ?",
+                    (deletion_id, self.chunk_size),
+                )
+            else:
+                favorites = "AND is_favorite = 0" if keep_favorites else ""
+                cursor.execute(
+                    f"""
+                    SELECT id FROM clip_meta
+                    WHERE seq <= ? {favorites}
+                    LIMIT ?
+                """,
+                    (max_seq, self.chunk_size),
+                )
+            rows = cursor.fetchall()
+            if not rows:
+                cursor.execute(
+                    "DELETE FROM deletions WHERE id = ?", (deletion_id,)
+                )
+            for (item_id,) in rows:
+                self.db_manager._delete_item(cursor, item_id)
+        return True
@@ -1,22 +1,158 @@
-CREATE TABLE IF NOT EXISTS clipboard_history (
+-- Created with PRAGMA auto_vacuum = INCREMENTAL (set before WAL mode), so
+-- pruned pages can be returned with PRAGMA incremental_vacuum.
+
+-- Hot, narrow per-item state: everything a re-copy, favorite toggle or
+-- backup touches. Rewriting one of these rows never copies payload data.
+CREATE TABLE IF NOT EXISTS clip_meta (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
-    content TEXT NOT NULL,
-    content_hash TEXT UNIQUE,
+    content_hash BLOB UNIQUE,   -- 16-byte keyed BLAKE2b of payload or text
     content_type TEXT DEFAULT 'text',
-    file_path TEXT,
     file_size INTEGER,
     mime_type TEXT,
-    thumbnail BLOB,
     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
     is_favorite INTEGER DEFAULT 0,
     access_count INTEGER DEFAULT 0,
-    backed_up INTEGER DEFAULT 0
+    backed_up INTEGER DEFAULT 0,
+    image_width INTEGER,
+    image_height INTEGER,
+    display_snippet TEXT,    -- precomputed one-line list text
+    flags INTEGER DEFAULT 0, -- bit 1: looks like a URL
+    seq INTEGER,             -- monotonic order key, bumped on re-copy
+    byte_size INTEGER,       -- stored size incl. blob and thumbnails
+    deleted_by INTEGER       -- deletions.id while a delete is pending
+);
+
+-- Cold, large data written once per item (same id as clip_meta)
+CREATE TABLE IF NOT EXISTS clip_payload (
+    id INTEGER PRIMARY KEY,
+    content TEXT NOT NULL,
+    file_path TEXT,
+    thumbnail BLOB,          -- list icon
+    preview_thumbnail BLOB,  -- preview-size thumbnail
+    payload BLOB,            -- raw image bytes (content is '' for images)
+    blob_key TEXT,           -- set when payload/text lives in the blob store
+    codec TEXT               -- NULL, 'zlib', 'zstd' or 'zstd:<dict id>'
+);
+
+-- How many clip_payload rows point at each blob; GC deletes blobs at zero
+CREATE TABLE IF NOT EXISTS blob_refs (
+    blob_key TEXT PRIMARY KEY,
+    refs INTEGER NOT NULL
+);
+
+-- Pending deletes, purged in chunks once their undo window is over. A row
+-- with max_seq NULL is a single delete (see clip_meta.deleted_by); otherwise
+-- it is a clear that hides every item up to max_seq (favorites too unless
+-- keep_favorites).
+CREATE TABLE IF NOT EXISTS deletions (
+    id INTEGER PRIMARY KEY,
+    created DATETIME DEFAULT CURRENT_TIMESTAMP,
+    max_seq INTEGER,
+    keep_favorites INTEGER DEFAULT 1
+);
+
+-- Trained zstd dictionaries, referenced by codec 'zstd:<id>'; never deleted
+CREATE TABLE IF NOT EXISTS compression_dicts (
+    id INTEGER PRIMARY KEY,
+    data BLOB NOT NULL,
+    created DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_timestamp ON clip_meta(timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_hash ON clip_meta(content_hash);
+CREATE INDEX IF NOT EXISTS idx_favorite ON clip_meta(is_favorite);
+CREATE INDEX IF NOT EXISTS idx_type ON clip_meta(content_type);
+CREATE INDEX IF NOT EXISTS idx_backed_up ON clip_meta(backed_up);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_seq ON clip_meta(seq);
+CREATE INDEX IF NOT EXISTS idx_type_seq ON clip_meta(content_type, seq);
+CREATE INDEX IF NOT EXISTS idx_favorite_seq ON clip_meta(is_favorite, seq);
+CREATE INDEX IF NOT EXISTS idx_deleted_by ON clip_meta(deleted_by)
+WHERE deleted_by IS NOT NULL;
+
+CREATE TRIGGER IF NOT EXISTS clip_meta_ad
+AFTER DELETE ON clip_meta
+BEGIN
+    DELETE FROM clip_payload WHERE id = old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS blob_refs_ai
+AFTER INSERT ON clip_payload
+WHEN new.blob_key IS NOT NULL
+BEGIN
+    INSERT INTO blob_refs (blob_key, refs) VALUES (new.blob_key, 1)
+    ON CONFLICT (blob_key) DO UPDATE SET refs = refs + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS blob_refs_ad
+AFTER DELETE ON clip_payload
+WHEN old.blob_key IS NOT NULL
+BEGIN
+    UPDATE blob_refs SET refs = refs - 1 WHERE blob_key = old.blob_key;
+END;
+
+CREATE TRIGGER IF NOT EXISTS blob_refs_au
+AFTER UPDATE OF blob_key ON clip_payload
+WHEN old.blob_key IS NOT new.blob_key
+BEGIN
+    UPDATE blob_refs SET refs = refs - 1 WHERE blob_key = old.blob_key;
+    INSERT INTO blob_refs (blob_key, refs)
+    SELECT new.blob_key, 1 WHERE new.blob_key IS NOT NULL
+    ON CONFLICT (blob_key) DO UPDATE SET refs = refs + 1;
+END;
+
+-- Full item, as the single table used to look (read-only)
+CREATE VIEW IF NOT EXISTS clipboard_history AS
+SELECT m.id, p.content, m.content_hash, m.content_type,
+       p.file_path, m.file_size, m.mime_type, p.thumbnail,
+       m.timestamp, m.is_favorite, m.access_count, m.backed_up,
+       p.payload, m.image_width, m.image_height,
+       p.preview_thumbnail, m.display_snippet, m.flags, m.seq,
+       p.blob_key, p.codec, m.deleted_by
+FROM clip_meta AS m LEFT JOIN clip_payload AS p ON p.id = m.id;
+
+
+-- Full-text search over text and file rows only (images are never indexed).
+-- External-content trigram index: substring semantics, no copy of the text.
+-- clip_text(content, blob_key, codec) is registered by the app and returns
+-- the plain text of compressed or blob-stored rows, so this view and the
+-- triggers need the app's connection. The index reads rows back through the
+-- view, never the raw (possibly compressed) clip_payload.content.
+CREATE VIEW IF NOT EXISTS clip_search AS
+SELECT p.id, clip_text(p.content, p.blob_key, p.codec) AS content,
+       p.file_path
+FROM clip_payload AS p JOIN clip_meta AS m ON m.id = p.id
+WHERE m.content_type IN ('text', 'file');
+
+CREATE VIRTUAL TABLE IF NOT EXISTS clipboard_fts USING fts5(
+    content, file_path,
+    content='clip_search', content_rowid='id',
+    tokenize='trigram'
 );
 
-CREATE INDEX IF NOT EXISTS idx_timestamp ON clipboard_history(timestamp DESC);
-CREATE INDEX IF NOT EXISTS idx_hash ON clipboard_history(content_hash);
-CREATE INDEX IF NOT EXISTS idx_favorite ON clipboard_history(is_favorite);
-CREATE INDEX IF NOT EXISTS idx_type ON clipboard_history(content_type);
-CREATE INDEX IF NOT EXISTS idx_backed_up ON clipboard_history(backed_up);
+CREATE TRIGGER IF NOT EXISTS clipboard_fts_ai
+AFTER INSERT ON clip_payload
+WHEN (SELECT content_type FROM clip_meta WHERE id = new.id) IN ('text', 'file')
+BEGIN
+    INSERT INTO clipboard_fts(rowid, content, file_path)
+    VALUES (new.id, clip_text(new.content, new.blob_key, new.codec), new.file_path);
+END;
 
+CREATE TRIGGER IF NOT EXISTS clipboard_fts_ad
+BEFORE DELETE ON clip_meta
+WHEN old.content_type IN ('text', 'file')
+BEGIN
+    INSERT INTO clipboard_fts(clipboard_fts, rowid, content, file_path)
+    SELECT 'delete', id, clip_text(content, blob_key, codec), file_path
+    FROM clip_payload WHERE id = old.id;
+END;
 
+CREATE TRIGGER IF NOT EXISTS clipboard_fts_au
+AFTER UPDATE OF content, file_path ON clip_payload
+WHEN (SELECT content_type FROM clip_meta WHERE id = new.id) IN ('text', 'file')
+BEGIN
+    INSERT INTO clipboard_fts(clipboard_fts, rowid, content, file_path)
+    VALUES ('delete', old.id, clip_text(old.content, old.blob_key, old.codec),
+            old.file_path);
+    INSERT INTO clipboard_fts(rowid, content, file_path)
+    VALUES (new.id, clip_text(new.content, new.blob_key, new.codec), new.file_path);
+END;
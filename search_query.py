@@ -0,0 +1,51 @@
+"""
+Search-box parsing shared by the database layer and the UI.
+
+Terms are whitespace separated and ANDed together. Double quotes keep a
+phrase together ("connection refused"), and a trailing * marks a prefix
+(conn*). With the trigram index every term is a substring match, so a
+prefix is already covered and the * is simply dropped.
+"""
+
+import re
+
+# Trigram FTS needs at least three characters to use the index
+MIN_INDEXED_TERM = 3
+
+_TERM_RE = re.compile(r'"([^"]*)"?|(\S+)')
+
+
+def parse_search_terms(text):
+    """Split a search string into terms, keeping quoted phrases intact."""
+    terms = []
+    for phrase, word in _TERM_RE.findall(text or ""):
+        term = phrase if phrase else word.rstrip("*")
+        term = term.strip()
+        if term:
+            terms.append(term)
+    return terms
+
+
+def fts_quote(term):
+    """Quote a term as an FTS5 string so operators in it are literal."""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def split_terms(terms):
+    """Split terms into (indexable, too_short_for_trigrams)."""
+    indexed = [t for t in terms if len(t) >= MIN_INDEXED_TERM]
+    short = [t for t in terms if len(t) < MIN_INDEXED_TERM]
+    return indexed, short
+
+
+def fts_match_expression(terms):
+    """Build an FTS5 MATCH expression that ANDs the given terms."""
+    return " AND ".join(fts_quote(t) for t in terms)
+
+
+def like_pattern(term):
+    """Escape a term for use in `LIKE ? ESCAPE '\\'`."""
+    escaped = (
+        term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    )
+    return f"%{escaped}%"
@@ -0,0 +1,89 @@
+"""
+Narrowing a finished search in memory as the query is extended.
+
+Every search term is a case-insensitive substring match on an item's text
+or file path, so if each term of the old query is contained in some term
+of the new one ("foo" -> "foob", "foo" -> "foo bar"), the new matches are
+a subset of the old. When the old search returned everything it matched
+(fewer rows than the page size), the new result can be computed from those
+rows without going back to SQLite.
+
+Only searches whose terms all go through the FTS5 trigram index are refined
+(see DatabaseManager._refinable): matching here folds Unicode case as FTS5
+does, while the LIKE fallback for short terms only folds ASCII.
+"""
+
+from search_query import parse_search_terms
+
+# Most text kept in memory for one search's candidates
+MAX_CANDIDATE_CHARS = 4 * 1024 * 1024
+
+# Separates text from file path so no term can match across the two
+FIELD_SEPARATOR = "\0"
+
+
+def search_haystack(content, file_path):
+    """The lower-cased text a search term is matched against."""
+    return f"{content or ''}{FIELD_SEPARATOR}{file_path or ''}".lower()
+
+
+def refines(old_terms, new_terms) -> bool:
+    """True if anything matching new_terms must also match old_terms."""
+    new_terms = [term.lower() for term in new_terms]
+    return all(
+        any(old in new for new in new_terms)
+        for old in (term.lower() for term in old_terms)
+    )
+
+
+class SearchCandidates:
+    """
+    The complete result of one search, with the text it was matched on.
+
+    `scope` identifies everything but the search term (filters, page size)
+    and `generation` the database state (DatabaseManager.write_generation);
+    a refinement is only valid for the same scope and generation.
+    """
+
+    def __init__(self, scope, terms, rows, haystacks, generation):
+        self.scope = scope
+        self.terms = terms
+        self.rows = rows
+        self.haystacks = haystacks
+        self.generation = generation
+
+    @classmethod
+    def from_search(cls, scope, search_term, rows, texts, generation):
+        """
+        Build from result rows and {item_id: (content, file_path)}.
+
+        Returns None if the text would take too much memory to keep.
+        """
+        haystacks = [
+            search_haystack(*texts.get(row[0], ("", ""))) for row in rows
+        ]
+        if sum(len(haystack) for haystack in haystacks) > MAX_CANDIDATE_CHARS:
+            return None
+        return cls(
+            scope, parse_search_terms(search_term), rows, haystacks, generation
+        )
+
+    def refine(self, scope, search_term, generation):
+        """
+        Rows matching a refined query, or None if the query isn't a
+        refinement of this one (or the data has changed since).
+        """
+        terms = parse_search_terms(search_term)
+        if (
+            not terms
+            or scope != self.scope
+            or generation != self.generation
+            or not refines(self.terms, terms)
+        ):
+            return None
+        haystacks = self.haystacks
+        keep = range(len(self.rows))
+        # One C-level substring pass per term over the surviving rows
+        for term in {term.lower() for term in terms}:
+            keep = [i for i in keep if term in haystacks[i]]
+        return [self.rows[i] for i in keep]
@@ -0,0 +1,109 @@
+import sqlite3
+import threading
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+# SQLite VM instructions between checks for a newer request
+PROGRESS_STEPS = 1000
+
+
+class SearchWorker(QThread):
+    """
+    Run history page queries (DatabaseManager.stream_page) off the GUI thread.
+
+    Only the newest request matters. request() bumps a generation counter
+    and returns the new value; a query still running for an older
+    generation is aborted by its connection's progress handler within
+    PROGRESS_STEPS SQLite instructions, and an older request that hasn't
+    started yet is simply replaced. Rows are emitted in chunks as SQLite
+    finds them, tagged with their generation, so receivers can drop
+    anything stale.
+    """
+
+    rows_ready = pyqtSignal(int, list)  # generation, summaries
+    page_done = pyqtSignal(int, int)  # generation, rows in the page
+
+    def __init__(self, db_manager, chunk_size: int = 50):
+        super().__init__()
+        self.db_manager = db_manager
+        self.chunk_size = chunk_size
+        self._generation = 0
+        self._request = None
+        self._stopping = False
+        self._wakeup = threading.Condition()
+
+    # ---------- Any thread ----------
+
+    def request(self, filters, after_seq, page_size):
+        """Queue a page() query, superseding earlier ones; return its generation."""
+        with self._wakeup:
+            self._generation += 1
+            self._request = (self._generation, dict(filters), after_seq, page_size)
+            self._wakeup.notify()
+            return self._generation
+
+    def cancel(self):
+        """Abort the running query and drop any queued one."""
+        with self._wakeup:
+            self._generation += 1
+            self._request = None
+
+    def stop(self):
+        """Abort pending work and stop the thread."""
+        with self._wakeup:
+            self._stopping = True
+            self._generation += 1
+            self._request = None
+            self._wakeup.notify()
+        self.wait(5000)
+
+    # ---------- Worker loop ----------
+
+    def _superseded(self, generation):
+        return generation != self._generation
+
+    def run(self):
+        running = 0  # generation of the query in progress
+        conn = self.db_manager.connections.reader()
+        # A true return value makes SQLite abort the statement
+        conn.set_progress_handler(
+            lambda: self._superseded(running), PROGRESS_STEPS
+        )
+        try:
+            while True:
+                with self._wakeup:
+                    while self._request is None and not self._stopping:
+                        self._wakeup.wait()
+                    if self._stopping:
+                        return
+                    request, self._request = self._request, None
+                running = request[0]
+                self._run_query(*request)
+                running = 0
+        finally:
+            # Also drops the progress handler with the connection
+            self.db_manager.connections.release_reader()
+
+    def _run_query(self, generation, filters, after_seq, page_size):
+        count = 0
+        try:
+            for rows in self.db_manager.stream_page(
+                after_seq=after_seq,
+                page_size=page_size,
+                filters=filters,
+                chunk_size=self.chunk_size,
+            ):
+                if self._superseded(generation):
+                    return
+                count += len(rows)
+                self.rows_ready.emit(generation, rows)
+        except sqlite3.OperationalError as e:
+            if not self._superseded(generation):
+                print(f"Search error: {e}")
+            # otherwise: interrupted by the progress handler
+        except Exception as e:
+            print(f"Search error: {e}")
+        finally:
+            # Always end the page, or the model would wait on it forever
+            # (receivers drop stale generations anyway)
+            self.page_done.emit(generation, count)
@@ -321,12 +321,41 @@ Categories=Utility;
             # This will test imports but won't run the app
             print("✅ Application imports successfully")
 
-            return True
+            return self.test_image_capture()
 
         except Exception as e:
             print(f"❌ Application test failed: {e}")
             return False
 
+    def test_image_capture(self):
+        """Run a copied image through the capture pipeline's decode path."""
+        try:
+            sys.path.insert(0, str(self.script_dir))
+            from PyQt6.QtGui import QImage
+            from PyQt6.QtWidgets import QApplication
+
+            from ingest_pipeline import IngestPipeline
+
+            # Keep a reference; Qt needs the application object alive
+            self._qt_app = QApplication.instance() or QApplication([])
+            image = QImage(4, 4, QImage.Format.Format_RGB32)
+            image.fill(0xFF3366)
+            pipeline = IngestPipeline(dedupe=lambda content_hash: True)
+            try:
+                item = pipeline.run_stages("", "image", {"image": image})
+            finally:
+                pipeline.shutdown()
+            _, _, metadata = item
+            if not metadata.get("payload") or not metadata.get("content_hash"):
+                print("❌ Image capture produced no PNG payload or hash")
+                return False
+            print("✅ Image capture test successful")
+            return True
+
+        except Exception as e:
+            print(f"❌ Image capture test failed: {e}")
+            return False
+
     def run_setup(self):
         """Run the complete setup process."""
         print(f"🎯 Setting up {self.app_name}")
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+
+from database_manager import DatabaseManager
+
+TEXTS = ["über grün", "Über alles", "ΟΔΟΣ ΚΑΛΗ", "οδος καλη", "plain text"]
+
+
+class RefinedSearchTest(unittest.TestCase):
+    """A search narrowed in memory must match a fresh search of the same query."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(os.path.join(self.tmp.name, "history.db"))
+        self.db.apply_batch([("add", {"content": text}) for text in TEXTS])
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def search(self, term):
+        rows = self.db.page(filters={"search_term": term}, page_size=50)
+        return sorted(row[2] for row in rows)
+
+    def fresh_search(self, term):
+        self.db.query_cache.clear()
+        self.db._search_candidates = None
+        return self.search(term)
+
+    def test_non_ascii_refinements(self):
+        for typed in (
+            ["ü", "über"],
+            ["üb", "über"],
+            ["Ü", "Über"],
+            ["über", "über ü"],
+            ["übe", "über"],
+            ["ΟΔΟ", "οδος"],
+            ["οδ", "ΟΔΟΣ"],
+        ):
+            with self.subTest(typed=typed):
+                self.fresh_search(typed[0])
+                for term in typed[1:]:
+                    refined = self.search(term)
+                self.assertEqual(refined, self.fresh_search(typed[-1]))
+
+    def test_indexed_refinement_stays_in_memory(self):
+        self.fresh_search("übe")
+        cached = self.db.cached_page(filters={"search_term": "über"}, page_size=50)
+        self.assertIsNotNone(cached)
+        self.assertEqual(self.search("über"), ["Über alles", "über grün"])
+
+
+if __name__ == "__main__":
+    unittest.main()
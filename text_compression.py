@@ -0,0 +1,138 @@
+"""
+Transparent per-row compression for clipboard text.
+
+Logs, JSON dumps and stack traces compress very well, so text above a size
+threshold is stored compressed and a codec marker is kept next to it:
+
+    None        stored as-is
+    "zlib"      zlib stream
+    "zstd"      zstd frame
+    "zstd:<n>"  zstd frame using dictionary <n> (compression_dicts.id)
+
+zlib is always available. zstd is used when the optional `zstandard`
+package is installed; once a dictionary has been trained from existing
+history, small clips (which plain compressors barely shrink) are worth
+compressing too. Data is only ever decompressed on read.
+"""
+
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # optional; zlib covers everything without it
+    zstandard = None
+
+# UTF-8 size below which text is stored uncompressed
+COMPRESS_THRESHOLD = 1024
+
+# With a trained dictionary even short clips shrink noticeably
+DICT_COMPRESS_THRESHOLD = 256
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+
+# Dictionary training: size of the dictionary and how many clips it needs
+DICT_SIZE = 64 * 1024
+DICT_MIN_SAMPLES = 200
+DICT_MAX_SAMPLE_BYTES = 16 * 1024
+
+
+class TextCompressor:
+    """Compress and decompress text with the best codec available."""
+
+    def __init__(self, threshold: int = COMPRESS_THRESHOLD, use_zstd=True):
+        self.threshold = int(threshold)
+        self.use_zstd = use_zstd and zstandard is not None
+        self._dicts = {}
+        self._dict_id = None
+
+    @property
+    def wants_dictionary(self) -> bool:
+        """True if zstd is available but no dictionary has been trained."""
+        return self.use_zstd and self._dict_id is None
+
+    @property
+    def min_size(self) -> int:
+        """Smallest UTF-8 size that compress() will try to shrink."""
+        if self._dict_id is not None:
+            return min(self.threshold, DICT_COMPRESS_THRESHOLD)
+        return self.threshold
+
+    def add_dictionary(self, dict_id: int, data: bytes):
+        """Register a stored dictionary; the newest one is used to compress."""
+        if zstandard is None:
+            return
+        self._dicts[dict_id] = zstandard.ZstdCompressionDict(data)
+        if self._dict_id is None or dict_id > self._dict_id:
+            self._dict_id = dict_id
+
+    def train(self, samples):
+        """Train a zstd dictionary from sample texts; None if not enough."""
+        if zstandard is None:
+            return None
+        samples = [
+            text.encode("utf-8")[:DICT_MAX_SAMPLE_BYTES]
+            for text in samples
+            if text
+        ]
+        if len(samples) < DICT_MIN_SAMPLES:
+            return None
+        try:
+            trained = zstandard.train_dictionary(DICT_SIZE, samples)
+        except zstandard.ZstdError as e:
+            print(f"Compression dictionary training failed: {e}")
+            return None
+        return trained.as_bytes()
+
+    def compress(self, text: str):
+        """
+        Return (codec, data) for storing `text`.
+
+        codec is None (and data the original str) when the text is small or
+        doesn't compress by at least an eighth.
+        """
+        encoded = text.encode("utf-8")
+        if len(encoded) < self.min_size:
+            return None, text
+
+        if self._dict_id is not None:
+            codec = f"zstd:{self._dict_id}"
+            data = zstandard.ZstdCompressor(
+                level=ZSTD_LEVEL, dict_data=self._dicts[self._dict_id]
+            ).compress(encoded)
+        elif self.use_zstd:
+            codec = "zstd"
+            data = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(encoded)
+        else:
+            codec = "zlib"
+            data = zlib.compress(encoded, ZLIB_LEVEL)
+
+        if len(data) > len(encoded) - len(encoded) // 8:
+            return None, text
+        return codec, data
+
+    def decompress(self, codec, data) -> str:
+        """Inverse of compress(): the original text."""
+        if codec is None:
+            if isinstance(data, (bytes, memoryview)):
+                return bytes(data).decode("utf-8", errors="replace")
+            return data
+        if codec == "zlib":
+            raw = zlib.decompress(data)
+        elif codec == "zstd" or codec.startswith("zstd:"):
+            if zstandard is None:
+                raise RuntimeError(
+                    "This history contains zstd-compressed text; "
+                    "install the 'zstandard' package to read it"
+                )
+            _, _, dict_id = codec.partition(":")
+            if dict_id:
+                decompressor = zstandard.ZstdDecompressor(
+                    dict_data=self._dicts[int(dict_id)]
+                )
+            else:
+                decompressor = zstandard.ZstdDecompressor()
+            raw = decompressor.decompress(data)
+        else:
+            raise ValueError(f"Unknown text codec: {codec}")
+        return raw.decode("utf-8", errors="replace")
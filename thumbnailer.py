@@ -0,0 +1,143 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt6.QtCore import QBuffer, QByteArray, QIODevice, Qt
+from PyQt6.QtGui import QImage, QImageReader, QImageWriter
+
+from background_jobs import PeriodicJob
+
+# Longest edge in pixels for each stored thumbnail
+THUMBNAIL_SIZES = {"icon": 64, "preview": 300}
+THUMBNAIL_QUALITY = 70
+
+
+def thumbnail_format() -> str:
+    """Most compact format this Qt build can write (WebP if available)."""
+    formats = {bytes(f).lower() for f in QImageWriter.supportedImageFormats()}
+    return "WEBP" if b"webp" in formats else "PNG"
+
+
+def make_thumbnails(data: bytes, fmt: str = None):
+    """
+    Build every THUMBNAIL_SIZES entry from encoded image bytes.
+
+    The image is decoded once, already downscaled by the reader where the
+    codec supports it, and each size is derived from the previous one.
+    Returns {name: bytes}, or None if the data can't be decoded. Only uses
+    QImage, so it is safe to call from worker threads.
+    """
+    fmt = fmt or thumbnail_format()
+    buffer = QBuffer()
+    buffer.setData(QByteArray(data))
+    buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+    reader = QImageReader(buffer)
+    reader.setAutoTransform(True)
+
+    largest = max(THUMBNAIL_SIZES.values())
+    size = reader.size()
+    if size.isValid() and max(size.width(), size.height()) > largest * 2:
+        # Lets JPEG & co. decode at reduced resolution
+        reader.setScaledSize(
+            size.scaled(
+                largest * 2, largest * 2, Qt.AspectRatioMode.KeepAspectRatio
+            )
+        )
+
+    image = reader.read()
+    if image.isNull():
+        return None
+
+    thumbnails = {}
+    for name, edge in sorted(
+        THUMBNAIL_SIZES.items(), key=lambda kv: kv[1], reverse=True
+    ):
+        if max(image.width(), image.height()) > edge:
+            image = image.scaled(
+                edge,
+                edge,
+                Qt.AspectRatioMode.KeepAspectRatio,
+                Qt.TransformationMode.SmoothTransformation,
+            )
+        thumbnails[name] = _encode(image, fmt)
+    return thumbnails
+
+
+def _encode(image: QImage, fmt: str) -> bytes:
+    out = QBuffer()
+    out.open(QIODevice.OpenModeFlag.WriteOnly)
+    image.save(out, fmt, THUMBNAIL_QUALITY)
+    return bytes(out.data())
+
+
+class ThumbnailJob(PeriodicJob):
+    """
+    Generate list/preview thumbnails for image rows that don't have one.
+
+    New captures call wake() so thumbnails appear right after ingest; the
+    same query also backfills older rows, a batch at a time, which makes
+    the job resumable. Decoding runs on a small thread pool.
+    """
+
+    name = "thumbnails"
+
+    def __init__(self, db_manager, batch_size: int = 16, max_workers: int = 2):
+        super().__init__(interval_seconds=120.0)
+        self.db_manager = db_manager
+        self.batch_size = batch_size
+        self.format = thumbnail_format()
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="thumbnail"
+        )
+
+    def stop(self, timeout: float = 2.0):
+        super().stop(timeout)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _thumbnails_for(self, row):
+        _, payload, blob_key = row
+        if blob_key is not None:
+            # Large images live in the blob store; decode from the mapping
+            with self.db_manager.blobs.view(blob_key) as data:
+                if data is None:
+                    return None
+                return make_thumbnails(data, self.format)
+        return make_thumbnails(payload, self.format)
+
+    def step(self):
+        connections = self.db_manager.connections
+        rows = (
+            connections.reader()
+            .execute(
+                """
+                SELECT id, payload, blob_key FROM clipboard_history
+                WHERE content_type = 'image' AND preview_thumbnail IS NULL
+                  AND (length(payload) > 0 OR blob_key IS NOT NULL)
+                ORDER BY id DESC
+                LIMIT ?
+            """,
+                (self.batch_size,),
+            )
+            .fetchall()
+        )
+        if not rows:
+            return False
+
+        results = list(self._pool.map(self._thumbnails_for, rows))
+
+        with connections.writer() as conn:
+            for (item_id, _, _), thumbs in zip(rows, results):
+                if thumbs is None:
+                    # Undecodable; mark as attempted so we don't retry forever
+                    thumbs = {"icon": None, "preview": b""}
+                conn.execute(
+                    """
+                    UPDATE clip_payload
+                    SET thumbnail = ?, preview_thumbnail = ?
+                    WHERE id = ?
+                """,
+                    (thumbs["icon"], thumbs["preview"], item_id),
+                )
+                conn.execute(
+                    "UPDATE clip_meta SET byte_size = byte_size + ? WHERE id = ?",
+                    (len(thumbs["icon"] or b"") + len(thumbs["preview"]), item_id),
+                )
+        return len(rows) == self.batch_size